@@ -1,6 +1,50 @@
 import cv2
 import numpy as np
 
+from face_records import as_face_records
+
+# Rótulos possíveis retornados por ActivityDetector.update (índice = código)
+ACTIVITY_LABELS = (
+    "desconhecida",
+    "parado",
+    "movimento leve",
+    "movimento moderado",
+    "movimento intenso",
+)
+ACTIVITY_CODES = {label: code for code, label in enumerate(ACTIVITY_LABELS)}
+
+# Limiares de movimento (média da diferença absoluta) entre parado / leve / moderado / intenso
+# – você pode ajustar empiricamente. Ajustados para a resolução original do frame.
+MOTION_THRESHOLDS = np.array([3.0, 8.0, 20.0])
+
+# Largura sugerida para a versão reduzida do frame (opcional)
+DEFAULT_PROXY_WIDTH = 160
+
+# Limiares equivalentes no frame reduzido, por largura do proxy. A redução elimina
+# ruído e suaviza bordas, então o mesmo movimento dá valores menores que na
+# resolução original. Calibrados maximizando a concordância de cada fronteira com
+# MOTION_THRESHOLDS em vídeos sintéticos (360p/720p/1080p); recalibre nos seus
+# vídeos com `python src/benchmark.py motion --calibrate`.
+PROXY_MOTION_THRESHOLDS = {
+    120: np.array([0.9, 5.3, 18.1]),
+    160: np.array([0.9, 6.1, 13.5]),
+    240: np.array([1.3, 6.9, 15.5]),
+    320: np.array([1.7, 6.6, 16.4]),
+}
+
+
+def motion_thresholds(proxy_width):
+    """Limiares para a largura do proxy (a calibrada mais próxima); None/0 = originais"""
+    if not proxy_width:
+        return MOTION_THRESHOLDS
+    nearest = min(PROXY_MOTION_THRESHOLDS, key=lambda width: abs(width - proxy_width))
+    return PROXY_MOTION_THRESHOLDS[nearest]
+
+
+def classify_motion(motion_values, thresholds=MOTION_THRESHOLDS):
+    """Converte valor(es) de movimento em código(s) de ACTIVITY_LABELS (1 a 4)"""
+    return np.searchsorted(thresholds, motion_values, side="right") + 1
+
 
 class ActivityDetector:
     """
@@ -10,16 +54,75 @@ class ActivityDetector:
     - movimento moderado
     - movimento intenso
     usando a diferença entre frames.
+
+    A diferença é calculada sobre o frame em cinza, opcionalmente reduzido
+    para `proxy_width` pixels de largura (None usa a resolução original, para
+    a qual MOTION_THRESHOLDS foi ajustado). No proxy, os rótulos usam
+    `thresholds` ou, se omitido, os de PROXY_MOTION_THRESHOLDS para a largura.
+    Opcionalmente mede o movimento por região: uma grade `grid=(linhas,
+    colunas)` e/ou rostos x fundo (`face_regions=True`, com as caixas passadas
+    em `update`). Os valores por região ficam em `region_motion`.
     """
 
-    def __init__(self):
+    def __init__(self, proxy_width=None, grid=None, face_regions=False, thresholds=None):
+        self.proxy_width = proxy_width
+        self.thresholds = motion_thresholds(proxy_width) if thresholds is None else np.asarray(thresholds)
+        self.grid = grid
+        self.face_regions = face_regions
         self.prev_gray = None
+        self.region_motion = {}
 
-    def update(self, frame):
+    def _proxy(self, frame):
+        """Frame em cinza reduzido para `proxy_width` de largura"""
+        h, w = frame.shape[:2]
+        if not self.proxy_width or w <= self.proxy_width:
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        size = (self.proxy_width, max(1, round(h * self.proxy_width / w)))
+        # Vizinho mais próximo até 4x o tamanho final e média por área no cinza:
+        # bem mais barato que INTER_AREA direto no frame colorido inteiro
+        if w > 4 * self.proxy_width:
+            frame = cv2.resize(frame, (4 * size[0], 4 * size[1]), interpolation=cv2.INTER_NEAREST)
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+    def _thresholds_for(self, frame, gray):
+        """Frames que já cabem no proxy são comparados em resolução original"""
+        return self.thresholds if gray.shape[1] < frame.shape[1] else MOTION_THRESHOLDS
+
+    def _grid_motion(self, diff):
+        """Movimento médio por célula; diff tem forma (..., h, w)"""
+        rows, cols = self.grid
+        h, w = diff.shape[-2:]
+        bh, bw = h // rows, w // cols
+        cells = diff[..., :bh * rows, :bw * cols].reshape(diff.shape[:-2] + (rows, bh, cols, bw))
+        return cells.mean(axis=(-3, -1))
+
+    def _face_motion(self, diff, frame_shape, faces):
+        """Movimento médio dentro das caixas dos rostos e no restante do frame"""
+        records = as_face_records(faces)
+        if not len(records):
+            return None, float(np.mean(diff))
+        sy = diff.shape[0] / frame_shape[0]
+        sx = diff.shape[1] / frame_shape[1]
+        mask = np.zeros(diff.shape, dtype=bool)
+        for x, y, w, h in zip(records.array["x"], records.array["y"],
+                              records.array["w"], records.array["h"]):
+            x0, y0 = max(0, int(x * sx)), max(0, int(y * sy))
+            x1, y1 = int(np.ceil((x + w) * sx)), int(np.ceil((y + h) * sy))
+            mask[y0:y1, x0:x1] = True
+        face_pixels = diff[mask]
+        background_pixels = diff[~mask]
+        return (
+            float(face_pixels.mean()) if face_pixels.size else None,
+            float(background_pixels.mean()) if background_pixels.size else None,
+        )
+
+    def update(self, frame, faces=None):
+        gray = self._proxy(frame)
 
-        if self.prev_gray is None:
+        if self.prev_gray is None or self.prev_gray.shape != gray.shape:
             self.prev_gray = gray
+            self.region_motion = {}
             return "desconhecida", 0.0
 
         diff = cv2.absdiff(gray, self.prev_gray)
@@ -27,14 +130,43 @@ class ActivityDetector:
 
         motion_value = float(np.mean(diff))
 
-        # Regras simples de limiares – você pode ajustar empiricamente
-        if motion_value < 3:
-            activity = "parado"
-        elif motion_value < 8:
-            activity = "movimento leve"
-        elif motion_value < 20:
-            activity = "movimento moderado"
+        if self.grid:
+            self.region_motion["grid"] = self._grid_motion(diff)
+        if self.face_regions:
+            face_motion, background_motion = self._face_motion(diff, frame.shape, faces or [])
+            self.region_motion["faces"] = face_motion
+            self.region_motion["background"] = background_motion
+
+        code = classify_motion(motion_value, self._thresholds_for(frame, gray))
+        return ACTIVITY_LABELS[code], motion_value
+
+    def update_batch(self, frames):
+        """Processa uma sequência de frames de uma vez.
+
+        Reduz cada frame e calcula diferenças, médias (e grade, se ativa) de
+        todo o bloco em operações vetorizadas. Retorna (rótulos, valores de
+        movimento); equivale a chamar `update` em cada frame, sem rostos.
+        Com grade, `region_motion["grid"]` traz uma matriz por frame.
+        """
+        if len(frames) == 0:
+            return [], np.zeros(0)
+        stack = np.stack([self._proxy(frame) for frame in frames])
+        if self.prev_gray is not None and self.prev_gray.shape == stack.shape[1:]:
+            previous = np.concatenate([self.prev_gray[None], stack[:-1]])
+            first_known = True
         else:
-            activity = "movimento intenso"
+            previous = np.concatenate([stack[:1], stack[:-1]])
+            first_known = False
+        self.prev_gray = stack[-1]
+
+        diff = np.abs(stack.astype(np.int16) - previous).astype(np.uint8)
+        motion_values = diff.mean(axis=(1, 2))
+        codes = classify_motion(motion_values, self._thresholds_for(frames[0], stack[0]))
+        if not first_known:
+            codes[0] = ACTIVITY_CODES["desconhecida"]
+            motion_values[0] = 0.0
 
-        return activity, motion_value
\ No newline at end of file
+        self.region_motion = {}
+        if self.grid:
+            self.region_motion["grid"] = self._grid_motion(diff)
+        return [ACTIVITY_LABELS[code] for code in codes.tolist()], motion_values
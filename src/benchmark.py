@@ -0,0 +1,252 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+# Adicione o diretório atual ao path para importar módulos locais
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from face_detectors import DETECTOR_PRESETS
+from activity_detection import (
+    ActivityDetector,
+    DEFAULT_PROXY_WIDTH,
+    MOTION_THRESHOLDS,
+    classify_motion,
+    motion_thresholds,
+)
+import main as pipeline
+
+# Variações do ActivityDetector comparadas em `benchmark.py motion`
+# (nome -> (kwargs do construtor, usa update_batch))
+MOTION_MODES = {
+    "original": ({"proxy_width": None}, False),
+    "proxy": ({"proxy_width": DEFAULT_PROXY_WIDTH}, False),
+    "proxy_grade": ({"proxy_width": DEFAULT_PROXY_WIDTH, "grid": (4, 4)}, False),
+    "proxy_rostos": ({"proxy_width": DEFAULT_PROXY_WIDTH, "face_regions": True}, False),
+    "lote": ({"proxy_width": DEFAULT_PROXY_WIDTH}, True),
+}
+
+
+def benchmark_presets(video_path, presets, max_frames=None):
+    """Roda a análise completa com cada preset no mesmo vídeo e compara velocidade/detecção"""
+    results = []
+    for preset in presets:
+        with tempfile.TemporaryDirectory() as output_dir:
+            result = pipeline.main(
+                video_path,
+                preset=preset,
+                output_mode="none",
+                output_dir=output_dir,
+                max_frames=max_frames,
+            )
+        if result is None:
+            return []
+        stats = result["face_stats"]
+        results.append({
+            "preset": preset,
+            "frames": result["frames"],
+            "frames_per_second": result["frames_per_second"],
+            "detection_rate": stats["frames_with_faces"] / max(1, stats["total_frames"]),
+            "faces_per_frame": stats["total_faces_detected"] / max(1, stats["total_frames"]),
+            "mediapipe_frames": stats["mediapipe_detections"],
+            "haar_frames": stats["haar_detections"],
+        })
+
+    print("\n" + "=" * 72)
+    print(f"BENCHMARK DE PRESETS - {video_path}")
+    print("=" * 72)
+    print(f"{'preset':<10} {'frames':>7} {'frames/s':>9} {'detecção':>9} "
+          f"{'rostos/frame':>13} {'mediapipe':>10} {'haar':>6}")
+    for r in results:
+        print(f"{r['preset']:<10} {r['frames']:>7} {r['frames_per_second']:>9.1f} "
+              f"{r['detection_rate']:>9.1%} {r['faces_per_frame']:>13.2f} "
+              f"{r['mediapipe_frames']:>10} {r['haar_frames']:>6}")
+    return results
+
+
+def _central_box(frame):
+    """Caixa fixa no centro do frame, no lugar de um rosto detectado"""
+    h, w = frame.shape[:2]
+    return [{"bbox": (w // 3, h // 4, w // 3, h // 2), "emotion": "neutro"}]
+
+
+def run_motion_mode(video_path, detector_kwargs, batched, max_frames, batch_size):
+    """Mede só o tempo do ActivityDetector (a decodificação fica de fora)"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+    detector = ActivityDetector(**detector_kwargs)
+    labels, motion_values, batch = [], [], []
+    elapsed = 0.0
+    frames = 0
+    while max_frames is None or frames < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames += 1
+        if batched:
+            batch.append(frame)
+            if len(batch) < batch_size:
+                continue
+            start = time.perf_counter()
+            batch_labels, batch_values = detector.update_batch(batch)
+            elapsed += time.perf_counter() - start
+            labels.extend(batch_labels)
+            motion_values.extend(batch_values.tolist())
+            batch = []
+        else:
+            faces = _central_box(frame) if detector.face_regions else None
+            start = time.perf_counter()
+            label, value = detector.update(frame, faces)
+            elapsed += time.perf_counter() - start
+            labels.append(label)
+            motion_values.append(value)
+    if batch:
+        start = time.perf_counter()
+        batch_labels, batch_values = detector.update_batch(batch)
+        elapsed += time.perf_counter() - start
+        labels.extend(batch_labels)
+        motion_values.extend(batch_values.tolist())
+    cap.release()
+    return {
+        "frames": frames,
+        "ms_per_frame": elapsed * 1000 / max(1, frames),
+        "labels": labels,
+        "motion_values": np.asarray(motion_values),
+    }
+
+
+def fit_motion_thresholds(reference_values, proxy_values, candidates=2001):
+    """Limiares no proxy que mais concordam com MOTION_THRESHOLDS na resolução original.
+
+    Cada fronteira é ajustada separadamente: testa quantis dos valores do proxy e
+    fica com o que mais acerta "acima do limiar original" nos mesmos frames.
+    """
+    reference_values = np.asarray(reference_values)
+    proxy_values = np.asarray(proxy_values)
+    options = np.quantile(proxy_values, np.linspace(0, 1, candidates))
+    fitted = []
+    for threshold in MOTION_THRESHOLDS:
+        above = reference_values > threshold
+        hits = [np.mean((proxy_values > option) == above) for option in options]
+        fitted.append(round(float(options[int(np.argmax(hits))]), 1))
+    return np.maximum.accumulate(fitted)
+
+
+def calibrate_motion(runs):
+    """Ajusta os limiares do modo proxy no vídeo medido e compara com os da tabela"""
+    reference, proxy = runs["original"], runs["proxy"]
+    # O primeiro frame não tem anterior: fica de fora do ajuste
+    n = min(len(reference["motion_values"]), len(proxy["motion_values"]))
+    reference_values = reference["motion_values"][1:n]
+    proxy_values = proxy["motion_values"][1:n]
+    if not len(reference_values):
+        return None
+    expected = classify_motion(reference_values)
+    current = motion_thresholds(DEFAULT_PROXY_WIDTH)
+    fitted = fit_motion_thresholds(reference_values, proxy_values)
+    print(f"\nCalibração do proxy ({DEFAULT_PROXY_WIDTH} px, {len(proxy_values)} frames):")
+    for label, thresholds in (("originais", MOTION_THRESHOLDS), ("tabela", current), ("ajustados", fitted)):
+        agreement = np.mean(classify_motion(proxy_values, thresholds) == expected)
+        print(f"  {label:<10} {np.array2string(np.asarray(thresholds), precision=1):<20} rótulos = {agreement:.1%}")
+    return fitted
+
+
+def benchmark_motion(video_path, modes, max_frames=None, batch_size=16, calibrate=False):
+    """Compara as variações do ActivityDetector com a versão original (resolução cheia)
+
+    Com `calibrate`, também ajusta os limiares do proxy neste vídeo
+    (veja PROXY_MOTION_THRESHOLDS em activity_detection.py).
+    """
+    if calibrate and "proxy" not in modes:
+        modes = list(modes) + ["proxy"]
+    runs = {}
+    for name in ["original"] + [m for m in modes if m != "original"]:
+        detector_kwargs, batched = MOTION_MODES[name]
+        run = run_motion_mode(video_path, detector_kwargs, batched, max_frames, batch_size)
+        if run is None:
+            print(f"Erro ao abrir o vídeo: {video_path}")
+            return []
+        runs[name] = run
+
+    reference = runs["original"]
+    results = []
+    for name, run in runs.items():
+        n = min(len(reference["labels"]), len(run["labels"]))
+        agreement = np.mean([a == b for a, b in zip(reference["labels"][:n], run["labels"][:n])]) if n else 0.0
+        results.append({
+            "mode": name,
+            "frames": run["frames"],
+            "ms_per_frame": run["ms_per_frame"],
+            "speedup": reference["ms_per_frame"] / max(run["ms_per_frame"], 1e-9),
+            "label_agreement": float(agreement),
+            "motion_mae": float(np.mean(np.abs(reference["motion_values"][:n] - run["motion_values"][:n]))) if n else 0.0,
+        })
+
+    print("\n" + "=" * 72)
+    print(f"BENCHMARK DE MOVIMENTO - {video_path}")
+    print("=" * 72)
+    print(f"{'modo':<14} {'frames':>7} {'ms/frame':>9} {'speedup':>8} {'rótulos =':>10} {'erro mov.':>10}")
+    for r in results:
+        print(f"{r['mode']:<14} {r['frames']:>7} {r['ms_per_frame']:>9.3f} {r['speedup']:>7.2f}x "
+              f"{r['label_agreement']:>10.1%} {r['motion_mae']:>10.2f}")
+    if calibrate:
+        calibrate_motion(runs)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline de análise de vídeo.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    presets_parser = subparsers.add_parser(
+        "presets", help="Compara frames/s e taxa de detecção de cada preset de detecção."
+    )
+    presets_parser.add_argument("--video_path", type=str, default="video_tech.mp4")
+    presets_parser.add_argument(
+        "--presets",
+        type=str,
+        default=",".join(DETECTOR_PRESETS),
+        help="Presets a comparar, separados por vírgula.",
+    )
+    presets_parser.add_argument("--max_frames", type=int, default=None)
+
+    motion_parser = subparsers.add_parser(
+        "motion", help="Compara custo e rótulos das variações do detector de atividade."
+    )
+    motion_parser.add_argument("--video_path", type=str, default="video_tech.mp4")
+    motion_parser.add_argument(
+        "--modes",
+        type=str,
+        default=",".join(MOTION_MODES),
+        help=f"Modos a comparar, separados por vírgula ({', '.join(MOTION_MODES)}).",
+    )
+    motion_parser.add_argument("--max_frames", type=int, default=None)
+    motion_parser.add_argument("--batch_size", type=int, default=16,
+                               help="Frames por chamada de update_batch (modo lote).")
+    motion_parser.add_argument("--calibrate", action="store_true",
+                               help="Ajusta os limiares do proxy neste vídeo e mostra a concordância.")
+
+    args = parser.parse_args()
+    if args.command == "presets":
+        benchmark_presets(
+            args.video_path,
+            [p.strip() for p in args.presets.split(",") if p.strip()],
+            max_frames=args.max_frames,
+        )
+    elif args.command == "motion":
+        modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+        unknown = [m for m in modes if m not in MOTION_MODES]
+        if unknown:
+            parser.error(f"Modos desconhecidos: {', '.join(unknown)}")
+        benchmark_motion(
+            args.video_path,
+            modes,
+            max_frames=args.max_frames,
+            batch_size=args.batch_size,
+            calibrate=args.calibrate,
+        )
@@ -0,0 +1,168 @@
+import os
+import glob
+import json
+from collections import deque
+
+import cv2
+
+# Tipos de evento que podem disparar a gravação de um clipe
+EVENT_TYPES = ("transicao", "movimento_intenso", "rosto")
+
+
+class EventDetector:
+    """
+    Detecta eventos relevantes frame a frame:
+    - transicao: nova transição emocional contada em SummaryCollector.emotion_transitions
+    - movimento_intenso: início (e continuação) de um trecho de 'movimento intenso'
+    - rosto: rostos aparecendo ou desaparecendo (mudança no número de rostos)
+    """
+
+    def __init__(self, enabled_events=EVENT_TYPES):
+        unknown = set(enabled_events) - set(EVENT_TYPES)
+        if unknown:
+            raise ValueError(f"Eventos desconhecidos: {sorted(unknown)}. Use: {', '.join(EVENT_TYPES)}")
+        self.enabled_events = set(enabled_events)
+        self.prev_transitions = {}
+        self.prev_total_transitions = 0
+        self.prev_face_count = 0
+        self.in_intense_motion = False
+
+    def detect(self, summary, activity_label, face_count):
+        """Retorna lista de (tipo, descrição, novo) para o frame atual.
+
+        `novo` é False quando o evento apenas continua um trecho já reportado
+        (ex.: movimento intenso prolongado), o que estende o clipe sem
+        poluir o índice.
+        """
+        events = []
+
+        if "transicao" in self.enabled_events:
+            total_transitions = sum(summary.emotion_transitions.values())
+            if total_transitions != self.prev_total_transitions:
+                for transition, count in summary.emotion_transitions.items():
+                    if count != self.prev_transitions.get(transition, 0):
+                        events.append(("transicao", transition, True))
+                self.prev_transitions = dict(summary.emotion_transitions)
+                self.prev_total_transitions = total_transitions
+
+        if "movimento_intenso" in self.enabled_events:
+            if activity_label == "movimento intenso":
+                events.append(("movimento_intenso", "movimento intenso", not self.in_intense_motion))
+                self.in_intense_motion = True
+            else:
+                self.in_intense_motion = False
+
+        if "rosto" in self.enabled_events and face_count != self.prev_face_count:
+            if self.prev_face_count == 0:
+                description = f"rosto apareceu ({face_count})"
+            elif face_count == 0:
+                description = "rosto desapareceu"
+            else:
+                description = f"rostos: {self.prev_face_count} -> {face_count}"
+            events.append(("rosto", description, True))
+        self.prev_face_count = face_count
+
+        return events
+
+
+class EventClipWriter:
+    """
+    Grava clipes anotados curtos apenas em torno de eventos.
+
+    Os últimos `pre_roll_s` segundos ficam em um buffer circular; quando um
+    evento ocorre o buffer é descarregado no início do clipe, e a gravação
+    continua até `post_roll_s` segundos após o último evento. Eventos próximos
+    são unidos no mesmo clipe. Um índice JSON descreve todos os clipes.
+    Clipes e índice de uma execução anterior em `output_dir` são apagados.
+    """
+
+    def __init__(self, output_dir, fps, pre_roll_s=2.0, post_roll_s=2.0,
+                 max_clip_s=60.0, fourcc="mp4v", extension=".mp4"):
+        self.output_dir = output_dir
+        self.fps = fps
+        self.pre_roll_frames = max(0, int(round(pre_roll_s * fps)))
+        self.post_roll_frames = max(1, int(round(post_roll_s * fps)))
+        self.max_clip_frames = max(self.post_roll_frames, int(round(max_clip_s * fps)))
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.extension = extension
+
+        self.ring = deque(maxlen=max(1, self.pre_roll_frames))
+        self.writer = None
+        self.current_clip = None
+        self.last_event_frame = 0
+        self.clips = []
+
+        os.makedirs(output_dir, exist_ok=True)
+        # Clipes antigos não constariam do novo índice (e iriam para o cache)
+        for path in glob.glob(os.path.join(output_dir, "clip_*")) + [os.path.join(output_dir, "index.json")]:
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def _time(self, frame_index):
+        """Tempo de início do frame no vídeo (frame_index começa em 1)"""
+        return round((frame_index - 1) / self.fps, 3)
+
+    def _open_clip(self, frame_index, frame):
+        h, w = frame.shape[:2]
+        start_frame = frame_index - len(self.ring) if self.pre_roll_frames else frame_index
+        filename = f"clip_{len(self.clips) + 1:04d}_f{start_frame}{self.extension}"
+        path = os.path.join(self.output_dir, filename)
+        self.writer = cv2.VideoWriter(path, self.fourcc, self.fps, (w, h))
+        if not self.writer.isOpened():
+            self.writer = None
+            raise RuntimeError(f"Não foi possível criar o clipe '{path}'")
+
+        if self.pre_roll_frames:
+            for buffered in self.ring:
+                self.writer.write(buffered)
+        self.ring.clear()
+
+        self.current_clip = {
+            "arquivo": filename,
+            "frame_inicio": start_frame,
+            "tempo_inicio_s": self._time(start_frame),
+            "eventos": [],
+        }
+
+    def _close_clip(self, frame_index):
+        self.writer.release()
+        self.writer = None
+        self.current_clip["frame_fim"] = frame_index
+        self.current_clip["tempo_fim_s"] = self._time(frame_index)
+        self.clips.append(self.current_clip)
+        self.current_clip = None
+
+    def process(self, frame_index, frame, events):
+        """Recebe o frame anotado e os eventos detectados nele"""
+        if events:
+            if self.writer is None:
+                self._open_clip(frame_index, frame)
+            self.last_event_frame = frame_index
+            for event_type, description, is_new in events:
+                if is_new:
+                    self.current_clip["eventos"].append({
+                        "frame": frame_index,
+                        "tempo_s": self._time(frame_index),
+                        "tipo": event_type,
+                        "descricao": description,
+                    })
+
+        if self.writer is not None:
+            self.writer.write(frame)
+            clip_length = frame_index - self.current_clip["frame_inicio"] + 1
+            if (frame_index - self.last_event_frame >= self.post_roll_frames or
+                    clip_length >= self.max_clip_frames):
+                self._close_clip(frame_index)
+        elif self.pre_roll_frames:
+            self.ring.append(frame)
+
+    def close(self, frame_index):
+        """Finaliza o clipe em andamento e grava o índice"""
+        if self.writer is not None:
+            self._close_clip(frame_index)
+        self.ring.clear()
+
+        index_path = os.path.join(self.output_dir, "index.json")
+        with open(index_path, "w", encoding="utf-8") as f:
+            json.dump({"fps": self.fps, "clipes": self.clips}, f, indent=2, ensure_ascii=False)
+        return index_path
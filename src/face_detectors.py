@@ -0,0 +1,278 @@
+import cv2
+import os
+import mediapipe as mp
+
+mp_face_detection = mp.solutions.face_detection
+
+# Índices dos 6 keypoints retornados pelo MediaPipe Face Detection
+KP_RIGHT_EYE = 0
+KP_LEFT_EYE = 1
+KP_NOSE_TIP = 2
+KP_MOUTH_CENTER = 3
+KP_RIGHT_EAR = 4
+KP_LEFT_EAR = 5
+
+
+def get_cascade_path(filename: str) -> str:
+    local_path = os.path.join(os.path.dirname(__file__), filename)
+    cv2_base = os.path.dirname(cv2.__file__)
+    candidates = [
+        local_path,
+        os.path.join(cv2_base, "data", filename),
+        os.path.join(cv2_base, "data", "haarcascades", filename),
+        os.path.join(cv2_base, "haarcascades", filename),
+    ]
+    for p in candidates:
+        if os.path.exists(p):
+            print(f"[INFO] Usando cascade '{filename}' em: {p}")
+            return p
+    msg = (
+        f"Arquivo '{filename}' não encontrado.\n"
+        "Verifique se ele está na pasta 'src/' ou ajuste o caminho em get_cascade_path()."
+    )
+    raise FileNotFoundError(msg)
+
+
+# Caminho de cada arquivo de cascade, resolvido uma única vez
+_cascade_paths = {}
+
+def load_cascade(filename="haarcascade_frontalface_default.xml"):
+    """Carrega um novo CascadeClassifier.
+
+    Cada chamada cria uma instância própria: detectMultiScale libera o GIL
+    e o classificador tem estado interno, então backends usados por threads
+    diferentes (um FaceModels por worker) não podem compartilhá-lo.
+    """
+    if filename not in _cascade_paths:
+        _cascade_paths[filename] = get_cascade_path(filename)
+    path = _cascade_paths[filename]
+    cascade = cv2.CascadeClassifier(path)
+    if cascade.empty():
+        raise RuntimeError(f"Falha ao carregar o classificador de rosto em: {path}")
+    return cascade
+
+
+def calculate_orientation_from_keypoints(keypoints):
+    """Estima a orientação do rosto a partir dos 6 keypoints do Face Detection.
+
+    Usa a mesma razão de simetria olho-nariz de calculate_face_orientation,
+    sem precisar rodar o Face Mesh.
+    """
+    if keypoints is None or len(keypoints) < 3:
+        return "frontal", 1.0
+
+    # Olho direito do sujeito aparece à esquerda da imagem (mesma convenção da malha)
+    left_eye_x = keypoints[KP_RIGHT_EYE].x
+    right_eye_x = keypoints[KP_LEFT_EYE].x
+    nose_x = keypoints[KP_NOSE_TIP].x
+
+    left_dist = abs(nose_x - left_eye_x)
+    right_dist = abs(right_eye_x - nose_x)
+
+    if max(left_dist, right_dist) == 0:
+        return "frontal", 1.0
+
+    symmetry_ratio = min(left_dist, right_dist) / max(left_dist, right_dist)
+    tilt = right_dist - left_dist
+
+    if symmetry_ratio < 0.6:
+        if tilt > 0:
+            return "lado_direito", symmetry_ratio
+        else:
+            return "lado_esquerdo", symmetry_ratio
+    else:
+        return "frontal", symmetry_ratio
+
+
+class FaceDetectorBackend:
+    """
+    Interface dos detectores de rosto.
+
+    `detect(frame, gray)` retorna uma lista de tuplas
+    (x, y, w, h, confiança, método[, orientação]) em pixels do frame.
+    """
+
+    name = "base"
+
+    def detect(self, frame, gray):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MediaPipeBackend(FaceDetectorBackend):
+    """MediaPipe Face Detection (model_selection 0 = curto alcance, 1 = longo alcance)"""
+
+    def __init__(self, model_selection=0, min_detection_confidence=0.5):
+        self.name = "mediapipe_full" if model_selection == 1 else "mediapipe_short"
+        self.detector = mp_face_detection.FaceDetection(
+            model_selection=model_selection,
+            min_detection_confidence=min_detection_confidence,
+        )
+
+    def detect(self, frame, gray):
+        h, w = frame.shape[:2]
+        faces = []
+        try:
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            rgb.flags.writeable = False
+            results = self.detector.process(rgb)
+
+            if results and hasattr(results, 'detections') and results.detections:
+                for detection in results.detections:
+                    if not hasattr(detection, 'location_data'):
+                        continue
+                    bbox = detection.location_data.relative_bounding_box
+                    if not bbox:
+                        continue
+
+                    x_min = int(bbox.xmin * w)
+                    y_min = int(bbox.ymin * h)
+                    bw = int(bbox.width * w)
+                    bh = int(bbox.height * h)
+
+                    # Ajustar coordenadas
+                    x_min = max(0, x_min)
+                    y_min = max(0, y_min)
+                    bw = max(1, min(w - x_min, bw))
+                    bh = max(1, min(h - y_min, bh))
+
+                    # Adicionar confiança da detecção se disponível
+                    confidence = detection.score[0] if hasattr(detection, 'score') else 0.5
+
+                    # Orientação estimada pelos keypoints (olhos, nariz, boca, orelhas)
+                    orientation = calculate_orientation_from_keypoints(
+                        detection.location_data.relative_keypoints
+                    )
+                    faces.append((x_min, y_min, bw, bh, confidence, "mediapipe", orientation))
+        except Exception as e:
+            print(f"Erro no MediaPipe face detection: {e}")
+        return faces
+
+    def close(self):
+        self.detector.close()
+
+
+class HaarBackend(FaceDetectorBackend):
+    """Haar Cascade frontal do OpenCV"""
+
+    name = "haar"
+
+    def __init__(self, scale_factor=1.3, min_neighbors=5, min_size=(30, 30),
+                 cascade_file="haarcascade_frontalface_default.xml"):
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = tuple(min_size)
+        self.cascade = load_cascade(cascade_file)
+
+    def detect(self, frame, gray):
+        h, w = gray.shape[:2]
+        faces = []
+        try:
+            haar_faces = self.cascade.detectMultiScale(
+                gray,
+                scaleFactor=self.scale_factor,
+                minNeighbors=self.min_neighbors,
+                minSize=self.min_size,
+            )
+            if haar_faces is not None and len(haar_faces) > 0:
+                for (x, y, w_f, h_f) in haar_faces:
+                    # Estimativa de confiança baseada no tamanho e posição
+                    size_confidence = min(1.0, (w_f * h_f) / (h * w) * 10)
+                    faces.append((int(x), int(y), int(w_f), int(h_f), size_confidence, "haar"))
+        except Exception as e:
+            print(f"Erro no Haar Cascade: {e}")
+        return faces
+
+
+class FallbackBackend(FaceDetectorBackend):
+    """Usa `primary` e só recorre a `fallback` quando nenhum rosto é encontrado"""
+
+    def __init__(self, primary, fallback):
+        self.name = f"{primary.name}+{fallback.name}"
+        self.primary = primary
+        self.fallback = fallback
+        self.allow_fallback = True
+
+    def detect(self, frame, gray):
+        faces = self.primary.detect(frame, gray)
+        if not faces and self.allow_fallback:
+            faces = self.fallback.detect(frame, gray)
+        return faces
+
+    def close(self):
+        self.primary.close()
+        self.fallback.close()
+
+
+# Registro de backends: nome -> fábrica que recebe os parâmetros do backend
+DETECTOR_BACKENDS = {}
+
+def register_backend(name):
+    def decorator(factory):
+        DETECTOR_BACKENDS[name] = factory
+        return factory
+    return decorator
+
+
+@register_backend("mediapipe_short")
+def _mediapipe_short(min_detection_confidence=0.5):
+    return MediaPipeBackend(model_selection=0, min_detection_confidence=min_detection_confidence)
+
+
+@register_backend("mediapipe_full")
+def _mediapipe_full(min_detection_confidence=0.5):
+    return MediaPipeBackend(model_selection=1, min_detection_confidence=min_detection_confidence)
+
+
+@register_backend("haar")
+def _haar(**params):
+    return HaarBackend(**params)
+
+
+@register_backend("mediapipe_haar")
+def _mediapipe_haar(mediapipe=None, haar=None):
+    return FallbackBackend(
+        MediaPipeBackend(**(mediapipe or {})),
+        HaarBackend(**(haar or {})),
+    )
+
+
+def create_backend(name, **params):
+    if name not in DETECTOR_BACKENDS:
+        raise ValueError(f"Backend de detecção desconhecido: {name}. "
+                         f"Disponíveis: {', '.join(sorted(DETECTOR_BACKENDS))}")
+    return DETECTOR_BACKENDS[name](**params)
+
+
+# Presets de velocidade/precisão. "balanced" reproduz o comportamento original.
+DETECTOR_PRESETS = {
+    "fast": {
+        "backend": "mediapipe_short",
+        "params": {"min_detection_confidence": 0.5},
+    },
+    "balanced": {
+        "backend": "mediapipe_haar",
+        "params": {
+            "mediapipe": {"model_selection": 0, "min_detection_confidence": 0.5},
+            "haar": {"scale_factor": 1.3, "min_neighbors": 5, "min_size": (30, 30)},
+        },
+    },
+    "accurate": {
+        "backend": "mediapipe_haar",
+        "params": {
+            "mediapipe": {"model_selection": 1, "min_detection_confidence": 0.4},
+            "haar": {"scale_factor": 1.1, "min_neighbors": 4, "min_size": (24, 24)},
+        },
+    },
+}
+DEFAULT_PRESET = "balanced"
+
+
+def create_preset(name):
+    if name not in DETECTOR_PRESETS:
+        raise ValueError(f"Preset desconhecido: {name}. "
+                         f"Disponíveis: {', '.join(DETECTOR_PRESETS)}")
+    preset = DETECTOR_PRESETS[name]
+    return create_backend(preset["backend"], **preset["params"])
@@ -1,33 +1,22 @@
 import cv2
-import os
 import numpy as np
 import mediapipe as mp
 
+from face_detectors import DEFAULT_PRESET, create_preset
+# Reexportado: get_cascade_path era definido neste módulo antes de face_detectors
+from face_detectors import get_cascade_path  # noqa: F401
+from face_records import (
+    FaceRecords, EMOTIONS, ORIENTATIONS, FEATURE_INDEX, as_face_records
+)
+from face_tracking import FaceTracker
+
 # Para MediaPipe 0.10.7, use esta forma de importar
-mp_face_detection = mp.solutions.face_detection
 mp_face_mesh = mp.solutions.face_mesh
 mp_drawing = mp.solutions.drawing_utils
 
-# Variáveis globais para estatísticas
-detection_stats = {
-    'total_frames': 0,
-    'frames_with_faces': 0,
-    'frames_without_faces': 0,
-    'total_faces_detected': 0,
-    'mediapipe_detections': 0,
-    'haar_detections': 0,
-    'emotion_changes': 0,
-    'last_emotion': None
-}
-
-def get_detection_stats():
-    """Retorna estatísticas de detecção"""
-    return detection_stats.copy()
-
-def reset_detection_stats():
-    """Reseta as estatísticas"""
-    global detection_stats
-    detection_stats = {
+def new_detection_stats():
+    """Dicionário de estatísticas de detecção zerado"""
+    return {
         'total_frames': 0,
         'frames_with_faces': 0,
         'frames_without_faces': 0,
@@ -35,42 +24,110 @@ def reset_detection_stats():
         'mediapipe_detections': 0,
         'haar_detections': 0,
         'emotion_changes': 0,
+        'mesh_skipped_profile': 0,
+        'detections_reused': 0,
+        'mesh_calls': 0,
+        'mesh_skipped_stable': 0,
         'last_emotion': None
     }
 
-def get_cascade_path(filename: str) -> str:
-    local_path = os.path.join(os.path.dirname(__file__), filename)
-    cv2_base = os.path.dirname(cv2.__file__)
-    candidates = [
-        local_path,
-        os.path.join(cv2_base, "data", filename),
-        os.path.join(cv2_base, "data", "haarcascades", filename),
-        os.path.join(cv2_base, "haarcascades", filename),
-    ]
-    for p in candidates:
-        if os.path.exists(p):
-            print(f"[INFO] Usando cascade '{filename}' em: {p}")
-            return p
-    msg = (
-        f"Arquivo '{filename}' não encontrado.\n"
-        "Verifique se ele está na pasta 'src/' ou ajuste o caminho em get_cascade_path()."
-    )
-    raise FileNotFoundError(msg)
+def new_detection_cache():
+    return {'faces': None, 'age': 0}
+
+# Variáveis globais para estatísticas
+detection_stats = new_detection_stats()
+
+# Ajustes de custo do pipeline (alterados por main/QualityController)
+DEFAULT_PIPELINE_SETTINGS = {
+    'detection_scale': 1.0,        # Fator de redução do frame enviado ao detector
+    'detection_interval': 1,       # Roda o detector a cada N frames e reaproveita as caixas
+    'use_mesh': True,              # Se False, emoções vêm de fallback_emotion (sem Face Mesh)
+    'allow_haar_fallback': True,   # Permite o fallback Haar do backend de detecção
+    'mesh_max_interval': 6,        # Máximo de frames entre malhas de um rosto estável (1 = todo frame)
+}
+pipeline_settings = dict(DEFAULT_PIPELINE_SETTINGS)
+
+# Última detecção, reaproveitada quando detection_interval > 1
+detection_cache = new_detection_cache()
+
+# Trilhas de rostos usadas para agendar a malha de cada rosto
+face_tracker = FaceTracker()
+
+def get_detection_stats():
+    """Retorna estatísticas de detecção"""
+    return detection_stats.copy()
+
+def reset_detection_stats():
+    """Reseta as estatísticas"""
+    global detection_stats, face_tracker
+    detection_stats = new_detection_stats()
+    detection_cache['faces'] = None
+    detection_cache['age'] = 0
+    face_tracker = FaceTracker()
+
+def get_pipeline_settings():
+    return pipeline_settings.copy()
+
+def set_pipeline_settings(**settings):
+    """Atualiza os ajustes de custo do pipeline (ver DEFAULT_PIPELINE_SETTINGS)"""
+    unknown = set(settings) - set(DEFAULT_PIPELINE_SETTINGS)
+    if unknown:
+        raise ValueError(f"Ajustes desconhecidos: {sorted(unknown)}")
+    pipeline_settings.update(settings)
+
+# Backend de detecção ativo (ver face_detectors.DETECTOR_PRESETS)
+detector_preset = DEFAULT_PRESET
+detector_backend = create_preset(DEFAULT_PRESET)
+
+def set_detector_preset(name):
+    """Troca o backend de detecção pelo preset indicado (fast, balanced, accurate)"""
+    global detector_backend, detector_preset
+    if name == detector_preset:
+        return
+    new_backend = create_preset(name)
+    detector_backend.close()
+    detector_backend = new_backend
+    detector_preset = name
 
-FACE_CASCADE_PATH = get_cascade_path("haarcascade_frontalface_default.xml")
-face_cascade = cv2.CascadeClassifier(FACE_CASCADE_PATH)
-if face_cascade.empty():
-    raise RuntimeError(f"Falha ao carregar o classificador de rosto em: {FACE_CASCADE_PATH}")
+def get_detector_preset():
+    return detector_preset
+
+def create_face_mesh():
+    return mp_face_mesh.FaceMesh(
+        static_image_mode=False,
+        max_num_faces=2,  # Aumentar para 2 para detectar rostos de lado
+        refine_landmarks=True,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
 
 # Inicializar os modelos do MediaPipe
-face_detector = mp_face_detection.FaceDetection(model_selection=0, min_detection_confidence=0.5)
-face_mesh = mp_face_mesh.FaceMesh(
-    static_image_mode=False,
-    max_num_faces=2,  # Aumentar para 2 para detectar rostos de lado
-    refine_landmarks=True,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
+face_mesh = create_face_mesh()
+
+class FaceModels:
+    """
+    Conjunto independente de modelos (detector + Face Mesh).
+
+    Os grafos do MediaPipe não aceitam chamadas concorrentes; cada thread que
+    analisa frames em paralelo deve usar seu próprio FaceModels.
+    """
+
+    def __init__(self, preset=DEFAULT_PRESET):
+        self.preset = preset
+        self.detector_backend = create_preset(preset)
+        self.face_mesh = create_face_mesh()
+
+    def close(self):
+        self.detector_backend.close()
+        self.face_mesh.close()
+
+class StreamState:
+    """Estatísticas, cache de detecção e trilhas de rostos de um fluxo de vídeo"""
+
+    def __init__(self):
+        self.stats = new_detection_stats()
+        self.detection_cache = new_detection_cache()
+        self.face_tracker = FaceTracker()
 
 # Definir índices de landmarks faciais
 LEFT_EYEBROW_IDX = [336, 296, 334, 293, 300, 276, 283, 282, 295, 285]
@@ -93,6 +150,10 @@ LEFT_EYE_OUTER = 33
 RIGHT_EYE_OUTER = 263
 MOUTH_CENTER = 0
 
+# Abaixo desta simetria (keypoints) o rosto é claramente de perfil e o Face Mesh é dispensado.
+# Mais rígido que o limiar de 0.6 usado com a malha, para só pular casos inequívocos.
+PROFILE_KEYPOINT_SYMMETRY = 0.35
+
 def landmark_distance(landmarks, i, j, w, h):
     """Calcula distância entre dois landmarks com verificação de None"""
     if landmarks is None or i >= len(landmarks) or j >= len(landmarks):
@@ -185,78 +246,71 @@ def calculate_mouth_asymmetry(landmarks):
     
     return corner_diff / vertical_open
 
-def detect_faces(frame, gray):
-    """Detecta rostos usando MediaPipe com fallback para Haar Cascade"""
-    h, w, _ = frame.shape
+def run_detector(frame, gray, backend=None):
+    """Executa o backend ativo (ou `backend`), opcionalmente em resolução reduzida"""
+    backend = backend or detector_backend
+    if hasattr(backend, 'allow_fallback'):
+        backend.allow_fallback = pipeline_settings['allow_haar_fallback']
+    
+    scale = pipeline_settings['detection_scale']
+    if scale >= 1.0:
+        return backend.detect(frame, gray)
+    
+    small_frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    small_gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
     faces = []
-    detection_method = "none"
+    for face in backend.detect(small_frame, small_gray):
+        x, y, w, h = (int(round(v / scale)) for v in face[:4])
+        faces.append((x, y, w, h) + tuple(face[4:]))
+    return faces
+
+def detect_faces(frame, gray, backend=None, state=None):
+    """Detecta rostos com o backend ativo (MediaPipe com fallback para Haar Cascade no preset padrão)"""
+    stats = state.stats if state is not None else detection_stats
+    cache = state.detection_cache if state is not None else detection_cache
     
-    # Usar MediaPipe Face Detector
-    try:
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        rgb.flags.writeable = False
+    interval = max(1, int(pipeline_settings['detection_interval']))
+    if cache['faces'] is not None and cache['age'] < interval - 1:
+        # Reaproveita as caixas da última detecção
+        faces = cache['faces']
+        cache['age'] += 1
+        stats['detections_reused'] += 1
+    else:
+        faces = run_detector(frame, gray, backend)
+        cache['faces'] = faces
+        cache['age'] = 0
         
-        if face_detector is not None:
-            results = face_detector.process(rgb)
-            
-            if results and hasattr(results, 'detections') and results.detections:
-                detection_method = "mediapipe"
-                detection_stats['mediapipe_detections'] += 1
-                
-                for detection in results.detections:
-                    if hasattr(detection, 'location_data'):
-                        bbox = detection.location_data.relative_bounding_box
-                        
-                        if bbox:
-                            x_min = int(bbox.xmin * w)
-                            y_min = int(bbox.ymin * h)
-                            bw = int(bbox.width * w)
-                            bh = int(bbox.height * h)
-                            
-                            # Ajustar coordenadas
-                            x_min = max(0, x_min)
-                            y_min = max(0, y_min)
-                            bw = max(1, min(w - x_min, bw))
-                            bh = max(1, min(h - y_min, bh))
-                            
-                            # Adicionar confiança da detecção se disponível
-                            confidence = detection.score[0] if hasattr(detection, 'score') else 0.5
-                            faces.append((x_min, y_min, bw, bh, confidence, "mediapipe"))
-    except Exception as e:
-        print(f"Erro no MediaPipe face detection: {e}")
-    
-    # Fallback para Haar Cascade
-    if not faces:
-        try:
-            haar_faces = face_cascade.detectMultiScale(
-                gray, 
-                scaleFactor=1.3, 
-                minNeighbors=5, 
-                minSize=(30, 30)
-            )
-            if haar_faces is not None and len(haar_faces) > 0:
-                detection_method = "haar"
-                detection_stats['haar_detections'] += 1
-                
-                for (x, y, w_f, h_f) in haar_faces:
-                    # Estimativa de confiança baseada no tamanho e posição
-                    size_confidence = min(1.0, (w_f * h_f) / (h * w) * 10)
-                    faces.append((x, y, w_f, h_f, size_confidence, "haar"))
-        except Exception as e:
-            print(f"Erro no Haar Cascade: {e}")
+        methods = {face[5] for face in faces}
+        if "mediapipe" in methods:
+            stats['mediapipe_detections'] += 1
+        if "haar" in methods:
+            stats['haar_detections'] += 1
     
     # Atualizar estatísticas
-    detection_stats['total_frames'] += 1
+    stats['total_frames'] += 1
     if faces:
-        detection_stats['frames_with_faces'] += 1
-        detection_stats['total_faces_detected'] += len(faces)
+        stats['frames_with_faces'] += 1
+        stats['total_faces_detected'] += len(faces)
     else:
-        detection_stats['frames_without_faces'] += 1
+        stats['frames_without_faces'] += 1
     
     return faces
 
-def classify_emotion_with_mesh(face_gray, face_color):
-    """Classifica emoção usando MediaPipe Face Mesh com lógica refinada"""
+def empty_mesh_features(mean_intensity, std_intensity):
+    """debug_info de quando a malha não encontra landmarks"""
+    return {
+        "mouth_open": None, "eye_open": None, "mean_intensity": mean_intensity,
+        "std_intensity": std_intensity, "eye_y": None, "eyebrow_diff": None,
+        "mouth_corner_tilt": None, "face_orientation": "frontal",
+        "mouth_asymmetry": 0.0
+    }
+
+def measure_mesh_features(face_gray, face_color, mesh=None):
+    """Roda o MediaPipe Face Mesh no rosto e mede as features usadas na classificação.
+
+    Retorna o debug_info; sem landmarks, "mouth_open" fica None.
+    """
+    mesh = mesh or face_mesh
     h, w = face_gray.shape[:2]
     mean_intensity = float(np.mean(face_gray))
     std_intensity = float(np.std(face_gray))
@@ -265,39 +319,20 @@ def classify_emotion_with_mesh(face_gray, face_color):
         face_rgb = cv2.cvtColor(face_color, cv2.COLOR_BGR2RGB)
         face_rgb.flags.writeable = False
         
-        if face_mesh is None:
-            debug_info = {
-                "mouth_open": None, "eye_open": None, "mean_intensity": mean_intensity,
-                "std_intensity": std_intensity, "eye_y": None, "eyebrow_diff": None,
-                "mouth_corner_tilt": None, "face_orientation": "frontal",
-                "mouth_asymmetry": 0.0
-            }
-            return None, debug_info
+        if mesh is None:
+            return empty_mesh_features(mean_intensity, std_intensity)
         
-        result = face_mesh.process(face_rgb)
+        result = mesh.process(face_rgb)
         
         # Verificações robustas
         if (not result or not hasattr(result, 'multi_face_landmarks') or 
             not result.multi_face_landmarks or len(result.multi_face_landmarks) == 0):
-            
-            debug_info = {
-                "mouth_open": None, "eye_open": None, "mean_intensity": mean_intensity,
-                "std_intensity": std_intensity, "eye_y": None, "eyebrow_diff": None,
-                "mouth_corner_tilt": None, "face_orientation": "frontal",
-                "mouth_asymmetry": 0.0
-            }
-            return None, debug_info
+            return empty_mesh_features(mean_intensity, std_intensity)
         
         landmarks = result.multi_face_landmarks[0].landmark
         
         if landmarks is None or len(landmarks) == 0:
-            debug_info = {
-                "mouth_open": None, "eye_open": None, "mean_intensity": mean_intensity,
-                "std_intensity": std_intensity, "eye_y": None, "eyebrow_diff": None,
-                "mouth_corner_tilt": None, "face_orientation": "frontal",
-                "mouth_asymmetry": 0.0
-            }
-            return None, debug_info
+            return empty_mesh_features(mean_intensity, std_intensity)
         
         # Calcular métricas
         mouth_open_px = landmark_distance(landmarks, UPPER_LIP_POINT, LOWER_LIP_POINT, w, h)
@@ -334,54 +369,7 @@ def classify_emotion_with_mesh(face_gray, face_color):
         # Calcular assimetria da boca
         mouth_asymmetry = calculate_mouth_asymmetry(landmarks)
         
-        # LÓGICA DE CLASSIFICAÇÃO REFINADA
-        emotion = "neutro"
-        
-        # 1. Primeiro verificar se é rosto de lado
-        if face_orientation in ["lado_esquerdo", "lado_direito"]:
-            emotion = "rosto_lado"
-        
-        # 2. Verificar surpresa (boca e olhos muito abertos)
-        elif mouth_open > 0.08 and eye_open > 0.045:
-            emotion = "surpreso"
-        
-        # 3. Verificar careta (assimetria da boca significativa)
-        elif mouth_asymmetry > 0.15 and mouth_open > 0.03:
-            emotion = "careta"
-        
-        # 4. Verificar desdém (sobrancelhas assimétricas, boca fechada)
-        elif eyebrow_diff and eyebrow_diff > 0.035 and mouth_open < 0.035:
-            emotion = "desdém"
-        
-        # 5. Verificar angústia (boca parcialmente aberta, intensidade média)
-        elif (0.04 <= mouth_open <= 0.07 and 
-              60 <= mean_intensity <= 110 and 
-              std_intensity > 35 and 
-              eye_open < 0.04):
-            emotion = "angústia"
-        
-        # 6. Verificar alegre/sorridente
-        elif mouth_open > 0.05:
-            if mean_intensity > 95:
-                emotion = "sorridente"
-            else:
-                emotion = "alegre"
-        
-        # 7. Verificar triste
-        elif mouth_open < 0.035 and mean_intensity < 75:
-            emotion = "triste"
-        
-        # 8. Verificar pensativo (olhos baixos, boca fechada, pouca variação)
-        elif (mouth_open < 0.035 and 
-              70 <= mean_intensity <= 125 and 
-              std_intensity < 35 and 
-              eye_y and eye_y > 0.52 and 
-              eye_open < 0.035):
-            emotion = "pensativo"
-        
-        # 9. Default para neutro
-
-        debug_info = {
+        return {
             "mouth_open": mouth_open,
             "eye_open": eye_open,
             "mean_intensity": mean_intensity,
@@ -393,18 +381,82 @@ def classify_emotion_with_mesh(face_gray, face_color):
             "mouth_asymmetry": mouth_asymmetry,
             "symmetry_ratio": symmetry_ratio
         }
-
-        return emotion, debug_info
         
     except Exception as e:
-        print(f"Erro no classify_emotion_with_mesh: {e}")
-        debug_info = {
-            "mouth_open": None, "eye_open": None, "mean_intensity": mean_intensity,
-            "std_intensity": std_intensity, "eye_y": None, "eyebrow_diff": None,
-            "mouth_corner_tilt": None, "face_orientation": "frontal",
-            "mouth_asymmetry": 0.0
-        }
+        print(f"Erro no measure_mesh_features: {e}")
+        return empty_mesh_features(mean_intensity, std_intensity)
+
+def classify_emotion_from_features(features):
+    """Classifica a emoção a partir das features da malha (medidas ou estimadas)"""
+    mouth_open = features["mouth_open"]
+    eye_open = features["eye_open"]
+    mean_intensity = features["mean_intensity"]
+    std_intensity = features["std_intensity"]
+    eye_y = features["eye_y"]
+    eyebrow_diff = features["eyebrow_diff"]
+    mouth_asymmetry = features["mouth_asymmetry"]
+    
+    # LÓGICA DE CLASSIFICAÇÃO REFINADA
+    
+    # 1. Primeiro verificar se é rosto de lado
+    if features["face_orientation"] in ["lado_esquerdo", "lado_direito"]:
+        return "rosto_lado"
+    
+    # 2. Verificar surpresa (boca e olhos muito abertos)
+    if mouth_open > 0.08 and eye_open > 0.045:
+        return "surpreso"
+    
+    # 3. Verificar careta (assimetria da boca significativa)
+    if mouth_asymmetry > 0.15 and mouth_open > 0.03:
+        return "careta"
+    
+    # 4. Verificar desdém (sobrancelhas assimétricas, boca fechada)
+    if eyebrow_diff and eyebrow_diff > 0.035 and mouth_open < 0.035:
+        return "desdém"
+    
+    # 5. Verificar angústia (boca parcialmente aberta, intensidade média)
+    if (0.04 <= mouth_open <= 0.07 and 
+        60 <= mean_intensity <= 110 and 
+        std_intensity > 35 and 
+        eye_open < 0.04):
+        return "angústia"
+    
+    # 6. Verificar alegre/sorridente
+    if mouth_open > 0.05:
+        return "sorridente" if mean_intensity > 95 else "alegre"
+    
+    # 7. Verificar triste
+    if mouth_open < 0.035 and mean_intensity < 75:
+        return "triste"
+    
+    # 8. Verificar pensativo (olhos baixos, boca fechada, pouca variação)
+    if (mouth_open < 0.035 and 
+        70 <= mean_intensity <= 125 and 
+        std_intensity < 35 and 
+        eye_y and eye_y > 0.52 and 
+        eye_open < 0.035):
+        return "pensativo"
+    
+    # 9. Default para neutro
+    return "neutro"
+
+def classify_emotion_with_mesh(face_gray, face_color, mesh=None):
+    """Classifica emoção usando MediaPipe Face Mesh com lógica refinada"""
+    debug_info = measure_mesh_features(face_gray, face_color, mesh)
+    if debug_info["mouth_open"] is None:
         return None, debug_info
+    return classify_emotion_from_features(debug_info), debug_info
+
+def classify_profile_from_keypoints(face_gray, orientation):
+    """Classifica rosto de perfil sem Face Mesh, usando a orientação dos keypoints"""
+    face_orientation, symmetry_ratio = orientation
+    debug_info = {
+        "mouth_open": None, "eye_open": None, "mean_intensity": float(np.mean(face_gray)),
+        "std_intensity": float(np.std(face_gray)), "eye_y": None, "eyebrow_diff": None,
+        "mouth_corner_tilt": None, "face_orientation": face_orientation,
+        "mouth_asymmetry": 0.0, "symmetry_ratio": symmetry_ratio
+    }
+    return "rosto_lado", debug_info
 
 def fallback_emotion(face_gray):
     """Classificação de fallback baseada apenas na intensidade da imagem"""
@@ -425,16 +477,46 @@ def fallback_emotion(face_gray):
         print(f"Erro no fallback_emotion: {e}")
         return "neutro"
 
-def process_faces_and_emotions(frame):
-    """Processa o frame para detecção facial e classificação de emoções"""
+# Cores das bounding boxes por emoção (BGR)
+EMOTION_COLORS = {
+    "surpreso": (255, 0, 0),      # Azul
+    "alegre": (0, 255, 0),        # Verde
+    "sorridente": (0, 200, 100),  # Verde claro
+    "triste": (255, 0, 255),      # Magenta
+    "pensativo": (255, 255, 0),   # Ciano
+    "desdém": (0, 165, 255),      # Laranja
+    "careta": (0, 255, 255),      # Amarelo
+    "angústia": (128, 0, 128),    # Roxo
+    "rosto_lado": (128, 128, 128),# Cinza
+    "neutro": (0, 255, 0)         # Verde
+}
+
+def analyze_faces(frame, models=None, state=None):
+    """Detecta rostos e classifica emoções sem modificar o frame.
+
+    Retorna um FaceRecords (array estruturado, uma linha por rosto). Por
+    padrão usa os modelos e estatísticas globais do módulo; `models`
+    (FaceModels) e `state` (StreamState) permitem análise concorrente de
+    vários fluxos. Cada rosto é associado a uma trilha (coluna `track_id`)
+    que decide quando a malha roda; nos outros frames as features são
+    estimadas pela trilha.
+    """
+    stats = state.stats if state is not None else detection_stats
+    tracker = state.face_tracker if state is not None else face_tracker
+    backend = models.detector_backend if models is not None else None
+    mesh = models.face_mesh if models is not None else None
+    max_interval = max(1, int(pipeline_settings['mesh_max_interval']))
     try:
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces_data = detect_faces(frame, gray)  # Agora retorna mais informações
-        faces_info = []
-        annotated_frame = frame.copy()
+        faces_data = detect_faces(frame, gray, backend, state)  # Agora retorna mais informações
         
+        # Caixas válidas (ajustadas ao frame) antes da associação às trilhas
+        valid_faces = []
         for face_data in faces_data:
-            if len(face_data) == 6:
+            orientation = None
+            if len(face_data) == 7:
+                x, y, w, h, confidence, method, orientation = face_data
+            elif len(face_data) == 6:
                 x, y, w, h, confidence, method = face_data
             else:
                 # Para compatibilidade com versão anterior
@@ -456,7 +538,12 @@ def process_faces_and_emotions(frame):
             
             if w <= 0 or h <= 0:
                 continue
-            
+            valid_faces.append((x, y, w, h, confidence, method, orientation))
+        
+        tracks = tracker.update([face[:4] for face in valid_faces])
+        records = FaceRecords.empty(len(valid_faces))
+        
+        for n, ((x, y, w, h, confidence, method, orientation), track) in enumerate(zip(valid_faces, tracks)):
             # Extrair regiões do rosto
             try:
                 face_gray = gray[y:y+h, x:x+w]
@@ -465,79 +552,120 @@ def process_faces_and_emotions(frame):
                 if face_gray.size == 0 or face_color.size == 0:
                     emotion = fallback_emotion(face_gray)
                     dbg = None
-                else:
-                    emotion, dbg = classify_emotion_with_mesh(face_gray, face_color)
-                    if emotion is None:
+                    track.reset_mesh()
+                elif orientation and orientation[1] < PROFILE_KEYPOINT_SYMMETRY:
+                    # Perfil evidente pelos keypoints: não há expressão a medir com a malha
+                    emotion, dbg = classify_profile_from_keypoints(face_gray, orientation)
+                    stats['mesh_skipped_profile'] += 1
+                    track.reset_mesh()
+                elif not pipeline_settings['use_mesh']:
+                    emotion = fallback_emotion(face_gray)
+                    dbg = None
+                    track.reset_mesh()
+                elif track.needs_mesh(max_interval):
+                    dbg = measure_mesh_features(face_gray, face_color, mesh)
+                    stats['mesh_calls'] += 1
+                    track.record_mesh(tracker.frame_index, dbg, max_interval)
+                    if dbg["mouth_open"] is None:
                         emotion = fallback_emotion(face_gray)
+                    else:
+                        emotion = classify_emotion_from_features(dbg)
+                else:
+                    # Expressão estável: features estimadas pela trilha, intensidade medida agora
+                    dbg = track.estimate_features(tracker.frame_index)
+                    dbg["mean_intensity"] = float(np.mean(face_gray))
+                    dbg["std_intensity"] = float(np.std(face_gray))
+                    emotion = classify_emotion_from_features(dbg)
+                    stats['mesh_skipped_stable'] += 1
             except Exception as e:
                 print(f"Erro ao extrair regiões faciais: {e}")
                 emotion = "neutro"
                 dbg = None
             
             # Rastrear mudanças de emoção
-            if detection_stats['last_emotion'] and detection_stats['last_emotion'] != emotion:
-                detection_stats['emotion_changes'] += 1
-            detection_stats['last_emotion'] = emotion
-            
-            faces_info.append({
-                "bbox": (int(x), int(y), int(w), int(h)),
-                "emotion": emotion,
-                "debug": dbg,
-                "detection_confidence": confidence,
-                "detection_method": method,
-                "face_area": w * h,
-                "face_ratio": w / h if h > 0 else 0
-            })
-            
-            # Desenhar bounding box com cor baseada na emoção
-            color_map = {
-                "surpreso": (255, 0, 0),      # Azul
-                "alegre": (0, 255, 0),        # Verde
-                "sorridente": (0, 200, 100),  # Verde claro
-                "triste": (255, 0, 255),      # Magenta
-                "pensativo": (255, 255, 0),   # Ciano
-                "desdém": (0, 165, 255),      # Laranja
-                "careta": (0, 255, 255),      # Amarelo
-                "angústia": (128, 0, 128),    # Roxo
-                "rosto_lado": (128, 128, 128),# Cinza
-                "neutro": (0, 255, 0)         # Verde
-            }
+            if stats['last_emotion'] and stats['last_emotion'] != emotion:
+                stats['emotion_changes'] += 1
+            stats['last_emotion'] = emotion
             
-            color = color_map.get(emotion, (0, 255, 0))
-            cv2.rectangle(annotated_frame, (x, y), (x+w, y+h), color, 2)
-            
-            # Adicionar texto da emoção com confiança
-            text_y = max(y - 10, 10)
-            emotion_text = f"{emotion} ({confidence:.1f})"
-            cv2.putText(annotated_frame, emotion_text, (x, text_y), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-            
-            # Adicionar informações de debug se disponíveis
-            if dbg and dbg.get("mouth_open") is not None:
-                debug_lines = [
-                    f"mouth:{dbg['mouth_open']:.3f}",
-                    f"eye:{dbg.get('eye_open', 0):.3f}",
-                    f"mean:{dbg['mean_intensity']:.1f}",
-                    f"ori:{dbg.get('face_orientation', 'frontal')}"
-                ]
-                dy = 13
-                for i, line in enumerate(debug_lines):
-                    text_y_pos = min(y + h + 15 + i * dy, frame.shape[0] - 10)
-                    cv2.putText(annotated_frame, line, 
-                               (x, text_y_pos), 
-                               cv2.FONT_HERSHEY_PLAIN, 0.7, (0, 255, 255), 1)
+            records.set_row(n, x, y, w, h, emotion, confidence, method, dbg, track.track_id)
+        
+        return records
         
-        return faces_info, annotated_frame
+    except Exception as e:
+        print(f"Erro em analyze_faces: {e}")
+        return FaceRecords()
+
+def draw_face_annotations(frame, faces_info):
+    """Desenha bounding boxes, emoções e debug diretamente no frame (in-place)"""
+    frame_h = frame.shape[0]
+    mouth_idx = FEATURE_INDEX["mouth_open"]
+    eye_idx = FEATURE_INDEX["eye_open"]
+    mean_idx = FEATURE_INDEX["mean_intensity"]
+    
+    for row in as_face_records(faces_info).array:
+        x, y, w, h = int(row["x"]), int(row["y"]), int(row["w"]), int(row["h"])
+        emotion = EMOTIONS[row["emotion"]]
+        confidence = float(row["confidence"])
+        features = row["features"]
+        
+        # Desenhar bounding box com cor baseada na emoção
+        color = EMOTION_COLORS.get(emotion, (0, 255, 0))
+        cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
         
+        # Adicionar texto da emoção com confiança
+        text_y = max(y - 10, 10)
+        emotion_text = f"{emotion} ({confidence:.1f})"
+        cv2.putText(frame, emotion_text, (x, text_y), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        
+        # Adicionar informações de debug se disponíveis
+        if row["has_debug"] and not np.isnan(features[mouth_idx]):
+            eye_open = 0.0 if np.isnan(features[eye_idx]) else features[eye_idx]
+            debug_lines = [
+                f"mouth:{features[mouth_idx]:.3f}",
+                f"eye:{eye_open:.3f}",
+                f"mean:{features[mean_idx]:.1f}",
+                f"ori:{ORIENTATIONS[row['orientation']]}"
+            ]
+            dy = 13
+            for i, line in enumerate(debug_lines):
+                text_y_pos = min(y + h + 15 + i * dy, frame_h - 10)
+                cv2.putText(frame, line, 
+                           (x, text_y_pos), 
+                           cv2.FONT_HERSHEY_PLAIN, 0.7, (0, 255, 255), 1)
+    
+    return frame
+
+def process_faces_and_emotions(frame, out=None, inplace=False):
+    """Processa o frame para detecção facial e classificação de emoções.
+
+    Como antes, retorna as anotações em uma cópia e não altera `frame`. Com
+    `out` (buffer pré-alocado do mesmo shape) o frame é copiado para ele e as
+    anotações vão para `out`; com `inplace=True` (ou `out=frame`) o desenho é
+    feito direto em `frame`, sem cópia.
+    """
+    faces_info = analyze_faces(frame)
+    
+    if inplace or out is frame:
+        annotated_frame = frame
+    elif out is None:
+        annotated_frame = frame.copy()
+    else:
+        np.copyto(out, frame)
+        annotated_frame = out
+    
+    try:
+        draw_face_annotations(annotated_frame, faces_info)
     except Exception as e:
-        print(f"Erro em process_faces_and_emotions: {e}")
-        return [], frame.copy()
+        print(f"Erro em draw_face_annotations: {e}")
+    
+    return faces_info, annotated_frame
 
 # Função para limpar recursos
 def cleanup():
     try:
-        if 'face_detector' in globals() and face_detector:
-            face_detector.close()
+        if 'detector_backend' in globals() and detector_backend:
+            detector_backend.close()
         if 'face_mesh' in globals() and face_mesh:
             face_mesh.close()
     except:
@@ -0,0 +1,178 @@
+import numpy as np
+
+# Tabelas de códigos inteiros (internados) usados nos registros compactos
+EMOTIONS = (
+    "neutro",
+    "alegre",
+    "sorridente",
+    "triste",
+    "surpreso",
+    "pensativo",
+    "desdém",
+    "careta",
+    "angústia",
+    "rosto_lado",
+    "desconhecido",
+)
+EMOTION_CODES = {name: code for code, name in enumerate(EMOTIONS)}
+UNKNOWN_EMOTION = EMOTION_CODES["desconhecido"]
+
+DETECTION_METHODS = ("mediapipe", "haar", "unknown")
+METHOD_CODES = {name: code for code, name in enumerate(DETECTION_METHODS)}
+
+ORIENTATIONS = ("frontal", "lado_esquerdo", "lado_direito")
+ORIENTATION_CODES = {name: code for code, name in enumerate(ORIENTATIONS)}
+
+# Métricas do Face Mesh guardadas por rosto (NaN quando indisponível)
+FEATURE_NAMES = (
+    "mouth_open",
+    "eye_open",
+    "mean_intensity",
+    "std_intensity",
+    "eye_y",
+    "eyebrow_diff",
+    "mouth_corner_tilt",
+    "mouth_asymmetry",
+    "symmetry_ratio",
+)
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURE_NAMES)}
+
+# track_id de rostos sem trilha (ex.: convertidos da lista de dicts antiga)
+NO_TRACK = -1
+
+FACE_DTYPE = np.dtype([
+    ("x", np.int32),
+    ("y", np.int32),
+    ("w", np.int32),
+    ("h", np.int32),
+    ("emotion", np.int8),
+    ("confidence", np.float32),
+    ("method", np.int8),
+    ("orientation", np.int8),
+    ("has_debug", np.bool_),
+    ("features", np.float32, (len(FEATURE_NAMES),)),
+    ("track_id", np.int32),  # Trilha do FaceTracker; NO_TRACK se desconhecida
+])
+
+
+def emotion_code(name):
+    """Converte o nome da emoção em código inteiro ('desconhecido' se não mapeada)"""
+    return EMOTION_CODES.get(name, UNKNOWN_EMOTION)
+
+
+def method_code(name):
+    return METHOD_CODES.get(name, METHOD_CODES["unknown"])
+
+
+def orientation_code(name):
+    return ORIENTATION_CODES.get(name, ORIENTATION_CODES["frontal"])
+
+
+class FaceRecords:
+    """
+    Rostos de um frame em um array estruturado do NumPy (uma linha por rosto).
+
+    Iterar ou indexar devolve a visão em dicionário usada anteriormente
+    (bbox, emotion, debug, detection_confidence, ...), mantendo compatibilidade
+    com código que espera a lista de dicts. Código novo deve usar `array`.
+    """
+
+    __slots__ = ("array",)
+
+    def __init__(self, array=None):
+        self.array = array if array is not None else np.empty(0, dtype=FACE_DTYPE)
+
+    @classmethod
+    def empty(cls, capacity):
+        return cls(np.empty(capacity, dtype=FACE_DTYPE))
+
+    @classmethod
+    def from_dicts(cls, faces_info):
+        """Converte a lista de dicts do formato antigo em registros compactos"""
+        records = cls.empty(len(faces_info))
+        for i, face_info in enumerate(faces_info):
+            x, y, w, h = face_info.get("bbox", (0, 0, 0, 0))
+            records.set_row(
+                i, x, y, w, h,
+                face_info.get("emotion", "desconhecido"),
+                face_info.get("detection_confidence", 0.5),
+                face_info.get("detection_method", "unknown"),
+                face_info.get("debug"),
+                face_info.get("track_id", NO_TRACK),
+            )
+        return records
+
+    def set_row(self, i, x, y, w, h, emotion, confidence, method, dbg, track_id=NO_TRACK):
+        row = self.array[i]
+        row["track_id"] = track_id
+        row["x"], row["y"], row["w"], row["h"] = x, y, w, h
+        row["emotion"] = emotion_code(emotion)
+        row["confidence"] = confidence
+        row["method"] = method_code(method)
+        row["has_debug"] = dbg is not None
+        if dbg is not None:
+            row["orientation"] = orientation_code(dbg.get("face_orientation", "frontal"))
+            row["features"] = [
+                np.nan if dbg.get(name) is None else dbg[name] for name in FEATURE_NAMES
+            ]
+        else:
+            row["orientation"] = ORIENTATION_CODES["frontal"]
+            row["features"] = np.nan
+
+    def truncate(self, n):
+        """Descarta linhas não preenchidas após a última posição válida"""
+        self.array = self.array[:n]
+        return self
+
+    @property
+    def emotions(self):
+        return self.array["emotion"]
+
+    @property
+    def track_ids(self):
+        return self.array["track_id"]
+
+    @property
+    def areas(self):
+        return self.array["w"].astype(np.int64) * self.array["h"]
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, i):
+        return self.row_as_dict(self.array[i])
+
+    def __iter__(self):
+        for row in self.array:
+            yield self.row_as_dict(row)
+
+    def to_dicts(self):
+        return list(self)
+
+    @staticmethod
+    def row_as_dict(row):
+        w, h = int(row["w"]), int(row["h"])
+        dbg = None
+        if row["has_debug"]:
+            dbg = {
+                name: (None if np.isnan(value) else float(value))
+                for name, value in zip(FEATURE_NAMES, row["features"])
+            }
+            dbg["face_orientation"] = ORIENTATIONS[row["orientation"]]
+        return {
+            "bbox": (int(row["x"]), int(row["y"]), w, h),
+            "emotion": EMOTIONS[row["emotion"]],
+            "debug": dbg,
+            "detection_confidence": float(row["confidence"]),
+            "detection_method": DETECTION_METHODS[row["method"]],
+            "face_area": w * h,
+            "face_ratio": w / h if h > 0 else 0,
+            "track_id": int(row["track_id"]),
+        }
+
+
+def as_face_records(faces_info):
+    """Aceita FaceRecords ou a lista de dicts antiga e devolve FaceRecords"""
+    if isinstance(faces_info, FaceRecords):
+        return faces_info
+    return FaceRecords.from_dicts(faces_info)
@@ -0,0 +1,178 @@
+from collections import deque
+
+# Features da malha usadas para medir a volatilidade da expressão, com a
+# escala de variação considerada relevante (próxima das margens entre os
+# limiares de classify_emotion_from_features)
+VOLATILITY_SCALES = {
+    "mouth_open": 0.01,
+    "eye_open": 0.004,
+    "eyebrow_diff": 0.008,
+    "mouth_asymmetry": 0.04,
+}
+# Features numéricas estimadas entre execuções da malha
+ESTIMATED_FEATURES = tuple(VOLATILITY_SCALES) + ("eye_y", "mouth_corner_tilt", "symmetry_ratio")
+
+# Volatilidade (variação por frame / escala) abaixo da qual o intervalo dobra
+# e acima da qual a malha volta a rodar em todo frame
+LOW_VOLATILITY = 0.25
+HIGH_VOLATILITY = 1.0
+# IoU mínimo entre a caixa atual e a da última malha; abaixo disso a malha roda de novo
+REMESH_BBOX_IOU = 0.7
+
+
+def box_iou(a, b):
+    """IoU entre duas caixas (x, y, w, h)"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+class FaceTrack:
+    """Um rosto acompanhado entre frames, com o agendamento da sua malha"""
+
+    def __init__(self, track_id, bbox):
+        self.track_id = track_id
+        self.bbox = bbox
+        self.missing = 0
+        self.mesh_interval = 1
+        self.frames_since_mesh = 0
+        self.mesh_bbox = None
+        self.last_features = None       # debug_info completo da última malha
+        self.samples = deque(maxlen=4)  # (frame, {feature: valor}) das últimas malhas
+        self.volatility = None
+
+    def needs_mesh(self, max_interval):
+        """Decide se a malha deve rodar neste frame"""
+        if max_interval <= 1 or self.last_features is None:
+            return True
+        if self.frames_since_mesh + 1 >= self.mesh_interval:
+            return True
+        # Caixa mudou muito desde a última malha (movimento, escala, troca de rosto)
+        if box_iou(self.mesh_bbox, self.bbox) < REMESH_BBOX_IOU:
+            self.mesh_interval = 1
+            return True
+        return False
+
+    def record_mesh(self, frame_index, features, max_interval):
+        """Registra uma execução da malha e recalcula o intervalo até a próxima"""
+        if features is None or features.get("mouth_open") is None:
+            # Malha sem landmarks: tenta de novo no próximo frame
+            self.reset_mesh()
+            return
+        self.frames_since_mesh = 0
+        self.mesh_bbox = self.bbox
+
+        self.last_features = dict(features)
+        self.samples.append((frame_index, {
+            name: features.get(name) for name in ESTIMATED_FEATURES
+        }))
+        self.volatility = self._volatility()
+        if self.volatility is None:
+            return
+        if self.volatility >= HIGH_VOLATILITY:
+            self.mesh_interval = 1
+        elif self.volatility < LOW_VOLATILITY:
+            self.mesh_interval = min(max_interval, self.mesh_interval * 2)
+        else:
+            self.mesh_interval = min(max_interval, self.mesh_interval)
+
+    def reset_mesh(self):
+        """Descarta as features medidas; a próxima análise do rosto roda a malha"""
+        self.frames_since_mesh = 0
+        self.mesh_bbox = self.bbox
+        self.last_features = None
+        self.samples.clear()
+        self.mesh_interval = 1
+        self.volatility = None
+
+    def _volatility(self):
+        """Maior variação por frame (normalizada) entre as duas últimas malhas"""
+        if len(self.samples) < 2:
+            return None
+        (f0, s0), (f1, s1) = self.samples[-2], self.samples[-1]
+        gap = max(1, f1 - f0)
+        volatility = 0.0
+        for name, scale in VOLATILITY_SCALES.items():
+            if s0[name] is None or s1[name] is None:
+                continue
+            volatility = max(volatility, abs(s1[name] - s0[name]) / gap / scale)
+        return volatility
+
+    def estimate_features(self, frame_index):
+        """Features estimadas para um frame sem malha.
+
+        Extrapola linearmente a partir das duas últimas malhas, limitado à
+        faixa dos valores já medidos (sem futuro disponível, não há como
+        interpolar de fato); com uma só medição, repete o último valor.
+        """
+        self.frames_since_mesh += 1
+        features = dict(self.last_features)
+        if len(self.samples) < 2:
+            return features
+        (f0, s0), (f1, s1) = self.samples[-2], self.samples[-1]
+        t = (frame_index - f1) / max(1, f1 - f0)
+        for name in ESTIMATED_FEATURES:
+            if s0[name] is None or s1[name] is None:
+                continue
+            values = [s[name] for _, s in self.samples if s[name] is not None]
+            estimate = s1[name] + (s1[name] - s0[name]) * t
+            features[name] = min(max(estimate, min(values)), max(values))
+        return features
+
+
+class FaceTracker:
+    """
+    Associa as caixas de cada frame a trilhas por IoU (guloso, maior IoU
+    primeiro). Trilhas sem caixa por mais de `max_missing` frames são
+    descartadas.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missing=5):
+        self.iou_threshold = iou_threshold
+        self.max_missing = max_missing
+        self.tracks = {}
+        self.next_id = 0
+        self.frame_index = 0
+
+    def update(self, boxes):
+        """Retorna uma FaceTrack para cada caixa (x, y, w, h), na mesma ordem"""
+        self.frame_index += 1
+        pairs = sorted(
+            (
+                (box_iou(track.bbox, box), track_id, i)
+                for track_id, track in self.tracks.items()
+                for i, box in enumerate(boxes)
+            ),
+            reverse=True,
+        )
+        assigned = [None] * len(boxes)
+        used_tracks = set()
+        for iou, track_id, i in pairs:
+            if iou < self.iou_threshold:
+                break
+            if assigned[i] is not None or track_id in used_tracks:
+                continue
+            assigned[i] = self.tracks[track_id]
+            used_tracks.add(track_id)
+
+        for i, box in enumerate(boxes):
+            if assigned[i] is None:
+                track = FaceTrack(self.next_id, box)
+                self.tracks[self.next_id] = track
+                used_tracks.add(self.next_id)
+                self.next_id += 1
+                assigned[i] = track
+            assigned[i].bbox = box
+            assigned[i].missing = 0
+
+        for track_id in list(self.tracks):
+            if track_id not in used_tracks:
+                self.tracks[track_id].missing += 1
+                if self.tracks[track_id].missing > self.max_missing:
+                    del self.tracks[track_id]
+        return assigned
@@ -0,0 +1,513 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import socketserver
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Adicione o diretório atual ao path para importar módulos locais
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from event_clips import EVENT_TYPES
+from video_writer import OUTPUT_CODECS, OUTPUT_MODES
+
+DEFAULT_QUEUE_PATH = "outputs/jobs.sqlite"
+DEFAULT_JOBS_DIR = "outputs/jobs"
+
+
+def _number(kind, minimum=None, maximum=None, optional=False):
+    """Conversor de opção numérica (int ou float) com limites inclusivos"""
+    def parse(value):
+        if value is None and optional:
+            return None
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"esperado um número, recebido {value!r}")
+        try:
+            number = float(value)
+        except ValueError:
+            raise ValueError(f"esperado um número, recebido {value!r}") from None
+        if not math.isfinite(number):
+            raise ValueError(f"esperado um número finito, recebido {value!r}")
+        if kind is int:
+            if not number.is_integer():
+                raise ValueError(f"esperado um inteiro, recebido {value!r}")
+            number = int(number)
+        if minimum is not None and number < minimum:
+            raise ValueError(f"deve ser >= {minimum}, recebido {number}")
+        if maximum is not None and number > maximum:
+            raise ValueError(f"deve ser <= {maximum}, recebido {number}")
+        return number
+    return parse
+
+
+def _positive(kind, optional=False):
+    """Conversor de número estritamente positivo"""
+    parse_number = _number(kind, optional=optional)
+
+    def parse(value):
+        number = parse_number(value)
+        if number is not None and number <= 0:
+            raise ValueError(f"deve ser > 0, recebido {number}")
+        return number
+    return parse
+
+
+def _choice(choices):
+    def parse(value):
+        if value not in choices:
+            raise ValueError(f"valor {value!r} inválido. Opções: {', '.join(choices)}")
+        return value
+    return parse
+
+
+def _preset(value):
+    from face_detectors import DETECTOR_PRESETS  # Só os nomes; nenhum modelo é carregado
+    return _choice(list(DETECTOR_PRESETS))(value)
+
+
+def _flag(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    raise ValueError(f"esperado true/false, recebido {value!r}")
+
+
+def _events(value):
+    """Lista de eventos (ou texto separado por vírgula, como em --clip_events)"""
+    if isinstance(value, str):
+        value = [event.strip() for event in value.split(",") if event.strip()]
+    if not isinstance(value, list) or not all(isinstance(event, str) for event in value):
+        raise ValueError(f"esperada uma lista de eventos, recebido {value!r}")
+    unknown = sorted(set(value) - set(EVENT_TYPES))
+    if unknown:
+        raise ValueError(f"eventos desconhecidos {unknown}. Use: {', '.join(EVENT_TYPES)}")
+    return value
+
+
+# Opções de main.main que podem ser enviadas em um job, com o conversor de cada uma
+OPTION_PARSERS = {
+    "preset": _preset,
+    "output_mode": _choice(OUTPUT_MODES),
+    "max_frames": _positive(int, optional=True),
+    "clip_events": _events,
+    "clip_pre_roll": _number(float, minimum=0),
+    "clip_post_roll": _number(float, minimum=0),
+    "detection_scale": _positive(float),
+    "detection_interval": _number(int, minimum=1),
+    "use_mesh": _flag,
+    "allow_haar_fallback": _flag,
+    "target_fps": _positive(float, optional=True),
+    "mesh_max_interval": _number(int, minimum=1),
+    "activity_width": _number(int, minimum=0),
+    "output_scale": _positive(float),
+    "output_every": _number(int, minimum=1),
+    "output_codec": _choice(list(OUTPUT_CODECS)),
+}
+ALLOWED_OPTIONS = set(OPTION_PARSERS)
+
+
+def validate_options(options):
+    """Valida e converte as opções de um job; ValueError com a primeira opção inválida"""
+    if not isinstance(options, dict):
+        raise ValueError("options deve ser um objeto JSON")
+    unknown = set(options) - ALLOWED_OPTIONS
+    if unknown:
+        raise ValueError(f"opções não suportadas: {sorted(unknown)}")
+    validated = {}
+    for name, value in options.items():
+        try:
+            validated[name] = OPTION_PARSERS[name](value)
+        except ValueError as e:
+            raise ValueError(f"opção '{name}': {e}") from None
+    return validated
+
+JOB_STATUSES = ("queued", "running", "done", "failed", "canceled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    video_path TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    worker TEXT,
+    frame_index INTEGER DEFAULT 0,
+    frame_count INTEGER DEFAULT 0,
+    frames_per_second REAL,
+    output_dir TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id);
+"""
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class JobQueue:
+    """Fila de jobs persistida em SQLite, compartilhada entre o servidor HTTP e os workers"""
+
+    def __init__(self, db_path=DEFAULT_QUEUE_PATH):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # Autocommit; transações explícitas apenas em claim()
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def submit(self, video_path, options):
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (video_path, options, status, created_at) VALUES (?, ?, 'queued', ?)",
+                (video_path, json.dumps(options), _now()),
+            )
+            return cursor.lastrowid
+
+    def claim(self, worker):
+        """Marca atomicamente o job mais antigo da fila como 'running' para este worker"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, started_at = ? WHERE id = ?",
+                (worker, _now(), row["id"]),
+            )
+            conn.execute("COMMIT")
+            return dict(row)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def update(self, job_id, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._connection() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def cancel(self, job_id):
+        """Cancela um job que ainda está na fila"""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'canceled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                (_now(), job_id),
+            )
+            return cursor.rowcount > 0
+
+    def requeue_interrupted(self):
+        """Jobs que estavam rodando quando o serviço parou voltam para a fila"""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, started_at = NULL, frame_index = 0 "
+                "WHERE status = 'running'"
+            )
+            return cursor.rowcount
+
+    def fail_worker_jobs(self, worker, error):
+        """Marca como falhos os jobs em execução de um worker que terminou"""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? "
+                "WHERE status = 'running' AND worker = ?",
+                (_now(), error, worker),
+            )
+            return cursor.rowcount
+
+    def get(self, job_id):
+        with self._connection() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            return self._job_view(row) if row else None
+
+    def list(self, status=None, limit=100):
+        with self._connection() as conn:
+            if status:
+                rows = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?", (status, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+            return [self._job_view(row) for row in rows]
+
+    def stats(self):
+        with self._connection() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            done = conn.execute(
+                "SELECT COUNT(*), SUM(frame_index), AVG(frames_per_second) FROM jobs WHERE status = 'done'"
+            ).fetchone()
+            running = conn.execute("SELECT * FROM jobs WHERE status = 'running'").fetchall()
+        return {
+            "jobs": {status: counts.get(status, 0) for status in JOB_STATUSES},
+            "frames_processed": done[1] or 0,
+            "avg_frames_per_second": done[2] or 0.0,
+            # Soma das velocidades dos jobs em andamento = vazão atual do pool
+            "current_frames_per_second": sum((row["frames_per_second"] or 0.0) for row in running),
+            "running": [self._job_view(row) for row in running],
+        }
+
+    @staticmethod
+    def _job_view(row):
+        job = dict(row)
+        job["options"] = json.loads(job["options"])
+        frame_count = job["frame_count"] or 0
+        job["progress"] = min(1.0, job["frame_index"] / frame_count) if frame_count > 0 else None
+        return job
+
+
+def worker_loop(queue_path, jobs_dir, worker_name, results_db=None, poll_interval=1.0,
+                cache_dir=None, cache_max_mb=None):
+    """Processo worker de vida longa: carrega os modelos uma vez e consome a fila"""
+    import main as pipeline  # Carrega MediaPipe/Haar apenas no processo worker
+
+    queue = JobQueue(queue_path)
+    cache_options = {}
+    if cache_dir:
+        cache_options["cache_dir"] = cache_dir
+        if cache_max_mb is not None:
+            cache_options["cache_max_mb"] = cache_max_mb
+    print(f"[{worker_name}] pronto (pid {os.getpid()})")
+
+    while True:
+        job = queue.claim(worker_name)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+
+        job_id = job["id"]
+        output_dir = os.path.join(jobs_dir, str(job_id))
+        queue.update(job_id, output_dir=output_dir)
+        start = time.perf_counter()
+
+        def report_progress(frame_index, frame_count):
+            elapsed = time.perf_counter() - start
+            queue.update(
+                job_id,
+                frame_index=frame_index,
+                frame_count=frame_count,
+                frames_per_second=frame_index / max(elapsed, 1e-9),
+            )
+
+        try:
+            result = pipeline.main(
+                job["video_path"],
+                output_dir=output_dir,
+                db_path=results_db,
+                progress_callback=report_progress,
+                **cache_options,
+                **json.loads(job["options"]),
+            )
+            if result is None:
+                queue.update(job_id, status="failed", finished_at=_now(),
+                             error="Não foi possível abrir o vídeo.")
+            else:
+                queue.update(
+                    job_id,
+                    status="done",
+                    finished_at=_now(),
+                    frame_index=result["frames"],
+                    frame_count=result["frame_count"],
+                    frames_per_second=result["frames_per_second"],
+                )
+        except Exception as e:
+            print(f"[{worker_name}] erro no job {job_id}: {e}")
+            queue.update(job_id, status="failed", finished_at=_now(), error=str(e))
+
+
+def make_handler(queue):
+    class JobRequestHandler(BaseHTTPRequestHandler):
+        def address_string(self):
+            # Em Unix sockets client_address é vazio
+            return self.client_address[0] if self.client_address else "unix"
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _job_id(self, path):
+            parts = path.strip("/").split("/")
+            if len(parts) >= 2 and parts[0] == "jobs" and parts[1].isdigit():
+                return int(parts[1])
+            return None
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/jobs":
+                status = parse_qs(url.query).get("status", [None])[0]
+                self._send_json(200, queue.list(status))
+            elif url.path == "/stats":
+                self._send_json(200, queue.stats())
+            elif self._job_id(url.path) is not None:
+                job = queue.get(self._job_id(url.path))
+                if job is None:
+                    self._send_json(404, {"error": "job não encontrado"})
+                else:
+                    self._send_json(200, job)
+            else:
+                self._send_json(404, {"error": "rota não encontrada"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path == "/jobs":
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except (ValueError, json.JSONDecodeError):
+                    self._send_json(400, {"error": "JSON inválido"})
+                    return
+                if not isinstance(payload, dict):
+                    self._send_json(400, {"error": "o corpo deve ser um objeto JSON"})
+                    return
+                video_path = payload.get("video_path")
+                options = payload.get("options", {})
+                if not video_path:
+                    self._send_json(400, {"error": "video_path é obrigatório"})
+                    return
+                if not isinstance(video_path, str):
+                    self._send_json(400, {"error": "video_path deve ser um texto"})
+                    return
+                try:
+                    options = validate_options(options)
+                except ValueError as e:
+                    self._send_json(400, {"error": str(e)})
+                    return
+                job_id = queue.submit(os.path.abspath(video_path), options)
+                self._send_json(201, queue.get(job_id))
+            elif url.path.endswith("/cancel") and self._job_id(url.path) is not None:
+                if queue.cancel(self._job_id(url.path)):
+                    self._send_json(200, queue.get(self._job_id(url.path)))
+                else:
+                    self._send_json(409, {"error": "só jobs na fila podem ser cancelados"})
+            else:
+                self._send_json(404, {"error": "rota não encontrada"})
+
+    return JobRequestHandler
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(host="127.0.0.1", port=8765, unix_socket=None, workers=2,
+          queue_path=DEFAULT_QUEUE_PATH, jobs_dir=DEFAULT_JOBS_DIR, results_db=None,
+          cache_dir=None, cache_max_mb=None, supervise_interval=1.0):
+    queue = JobQueue(queue_path)
+    requeued = queue.requeue_interrupted()
+    if requeued:
+        print(f"{requeued} job(s) interrompido(s) recolocado(s) na fila")
+
+    def start_worker(name):
+        process = multiprocessing.Process(
+            target=worker_loop,
+            args=(queue_path, jobs_dir, name, results_db, 1.0, cache_dir, cache_max_mb),
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    processes = {f"worker-{i + 1}": None for i in range(workers)}
+    for name in processes:
+        processes[name] = start_worker(name)
+
+    handler = make_handler(queue)
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = UnixHTTPServer(unix_socket, handler)
+        print(f"Serviço de jobs ouvindo em unix:{unix_socket} com {workers} worker(s)")
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        print(f"Serviço de jobs ouvindo em http://{host}:{port} com {workers} worker(s)")
+
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    try:
+        # Supervisão: um worker que morreu (segfault, OOM) tem o job marcado como
+        # falho (evita repetir um vídeo que derruba o worker) e é substituído
+        while True:
+            time.sleep(supervise_interval)
+            for name, process in processes.items():
+                if process.is_alive():
+                    continue
+                failed = queue.fail_worker_jobs(
+                    name, f"O worker {name} terminou inesperadamente (código {process.exitcode})."
+                )
+                print(f"[{name}] terminou (código {process.exitcode}); "
+                      f"{failed} job(s) marcado(s) como falho(s); iniciando substituto")
+                processes[name] = start_worker(name)
+    except KeyboardInterrupt:
+        print("Encerrando serviço de jobs...")
+    finally:
+        server.shutdown()
+        server.server_close()
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join()
+        if unix_socket and os.path.exists(unix_socket):
+            os.remove(unix_socket)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serviço local de fila de análises de vídeo.")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix_socket", type=str, default=None,
+                        help="Ouve em um Unix socket em vez de TCP.")
+    parser.add_argument("--workers", type=int, default=2, help="Número de workers de vida longa.")
+    parser.add_argument("--queue_db", type=str, default=DEFAULT_QUEUE_PATH)
+    parser.add_argument("--jobs_dir", type=str, default=DEFAULT_JOBS_DIR,
+                        help="Diretório base das saídas (um subdiretório por job).")
+    parser.add_argument("--results_db", type=str, default=None,
+                        help="Banco SQLite de resultados onde cada job concluído é indexado.")
+    parser.add_argument("--cache_dir", type=str, default=None,
+                        help="Cache de resultados compartilhado pelos workers (ex.: outputs/cache).")
+    parser.add_argument("--cache_max_mb", type=float, default=None,
+                        help="Tamanho máximo do cache de resultados.")
+    args = parser.parse_args()
+    serve(
+        host=args.host,
+        port=args.port,
+        unix_socket=args.unix_socket,
+        workers=args.workers,
+        queue_path=args.queue_db,
+        jobs_dir=args.jobs_dir,
+        results_db=args.results_db,
+        cache_dir=args.cache_dir,
+        cache_max_mb=args.cache_max_mb,
+    )
@@ -2,33 +2,129 @@ import cv2
 import argparse
 import os
 import sys
+import time
 
 # Adicione o diretório atual ao path para importar módulos locais
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    from face_emotion import process_faces_and_emotions, get_detection_stats, reset_detection_stats
+    from face_emotion import (
+        analyze_faces, draw_face_annotations, get_detection_stats, reset_detection_stats,
+        set_detector_preset, get_pipeline_settings, set_pipeline_settings,
+        DEFAULT_PIPELINE_SETTINGS
+    )
+    from face_detectors import DETECTOR_PRESETS, DEFAULT_PRESET
     from activity_detection import ActivityDetector
     from summary import SummaryCollector
+    from profiling import AllocationTracker
+    from event_clips import EventDetector, EventClipWriter, EVENT_TYPES
+    from results_db import index_result
+    from quality_controller import QualityController, levels_from_settings
+    from result_cache import ResultCache, DEFAULT_CACHE_MAX_MB, print_stats as print_cache_stats
+    from video_writer import (
+        BackgroundVideoWriter, DEFAULT_OUTPUT_CODEC, OUTPUT_CODECS, OUTPUT_MODES,
+        output_frame_size, resolve_codec
+    )
 except ImportError as e:
     print(f"Erro ao importar módulos: {e}")
     print("Verifique se todos os arquivos estão na mesma pasta:")
     print("- face_emotion.py")
+    print("- face_detectors.py")
     print("- activity_detection.py")
     print("- summary.py")
+    print("- profiling.py")
+    print("- event_clips.py")
+    print("- results_db.py")
+    print("- quality_controller.py")
+    print("- video_writer.py")
+    print("- result_cache.py")
     sys.exit(1)
 
 
-def main(video_path):
-    # Resetar estatísticas antes de começar
-    reset_detection_stats()
-    
+def main(video_path, track_allocations=False, output_mode="full", clip_events=EVENT_TYPES,
+         clip_pre_roll=2.0, clip_post_roll=2.0, preset=DEFAULT_PRESET, output_dir="outputs",
+         max_frames=None, db_path=None, progress_callback=None,
+         detection_scale=1.0, detection_interval=1, use_mesh=True, allow_haar_fallback=True,
+         mesh_max_interval=DEFAULT_PIPELINE_SETTINGS['mesh_max_interval'],
+         target_fps=None, activity_width=0,
+         output_scale=1.0, output_every=1, output_codec=DEFAULT_OUTPUT_CODEC,
+         cache_dir=None, cache_max_mb=DEFAULT_CACHE_MAX_MB):
+    """Analisa o vídeo e grava as saídas em `output_dir`.
+
+    Retorna um dict com o SummaryCollector, as estatísticas de detecção e o
+    tempo de processamento (usado pelos scripts de benchmark), ou None se o
+    vídeo não puder ser aberto. `progress_callback(frame_index, frame_count)`
+    é chamado a cada 30 frames, se informado. Com `target_fps`, um
+    QualityController ajusta escala/intervalo de detecção, Face Mesh e
+    fallback Haar durante a execução, partindo dos ajustes fixos informados.
+    `mesh_max_interval` limita quantos frames um rosto estável fica sem
+    Face Mesh (1 = malha em todo frame). `activity_width` reduz o frame usado na
+    detecção de atividade para essa largura (0 = resolução original, padrão),
+    com os limiares de PROXY_MOTION_THRESHOLDS. `output_scale`, `output_every` e
+    `output_codec` controlam o vídeo anotado (modo full): escala, um frame
+    gravado a cada N e codec/contêiner; a codificação roda em uma thread.
+    Com `cache_dir`, um resultado já calculado para o mesmo conteúdo de vídeo,
+    configuração e código é reaproveitado (exceto com `target_fps` ou
+    `track_allocations`, que dependem do tempo de execução).
+    """
     if not os.path.exists(video_path):
         print(f"Vídeo não encontrado em: {video_path}")
         print(f"Diretório atual: {os.getcwd()}")
         print(f"Arquivos no diretório: {os.listdir('.')}")
         return
 
+    # Cache de resultados: mesma análise do mesmo conteúdo não é refeita
+    result_cache = None
+    if cache_dir and not target_fps and not track_allocations:
+        result_cache = ResultCache(cache_dir, cache_max_mb)
+        cache_key = result_cache.key(video_path, {
+            "preset": preset,
+            "max_frames": max_frames,
+            "detection_scale": detection_scale,
+            "detection_interval": detection_interval,
+            "use_mesh": use_mesh,
+            "allow_haar_fallback": allow_haar_fallback,
+            "mesh_max_interval": mesh_max_interval,
+            "activity_width": activity_width,
+            "output_mode": output_mode,
+            "clip_events": sorted(clip_events),
+            "clip_pre_roll": clip_pre_roll,
+            "clip_post_roll": clip_post_roll,
+            "output_scale": output_scale,
+            "output_every": output_every,
+            "output_codec": output_codec,
+        })
+        cached = result_cache.load(cache_key, output_dir)
+        if cached is not None:
+            cached["video_path"] = video_path
+            print(f"Resultado encontrado no cache ({cache_key[:12]}); saídas copiadas para: {output_dir}")
+            print_cache_stats(result_cache.stats())
+            if db_path:
+                index_result(cached, db_path)
+                print(f"Resultados indexados em: {db_path}")
+            return cached
+
+    # Resetar estatísticas antes de começar
+    reset_detection_stats()
+    set_detector_preset(preset)
+    set_pipeline_settings(
+        detection_scale=detection_scale,
+        detection_interval=detection_interval,
+        use_mesh=use_mesh,
+        allow_haar_fallback=allow_haar_fallback,
+        mesh_max_interval=mesh_max_interval,
+    )
+
+    # Sem saída de vídeo não é preciso testar o codec
+    if output_mode == "none":
+        fourcc, extension = OUTPUT_CODECS[output_codec]
+    else:
+        try:
+            fourcc, extension = resolve_codec(output_codec)
+        except ValueError as e:
+            print(e)
+            return
+
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         print("Erro ao abrir o vídeo.")
@@ -37,31 +133,85 @@ def main(video_path):
     fps = cap.get(cv2.CAP_PROP_FPS)
     if fps == 0:
         fps = 20.0  # Valor padrão se não conseguir obter FPS
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     
     print(f"Processando vídeo: {video_path}")
     print(f"FPS: {fps}")
+    print(f"Preset de detecção: {preset}")
 
-    activity_detector = ActivityDetector()
-    summary = SummaryCollector()
+    activity_detector = ActivityDetector(proxy_width=activity_width)
+    summary = SummaryCollector(fps=fps)
+    allocation_tracker = AllocationTracker(enabled=track_allocations)
+    allocation_tracker.start()
+
+    quality_controller = None
+    if target_fps:
+        # Níveis partem dos ajustes fixos: nunca reativam mesh/Haar desligados
+        # nem usam escala maior ou intervalo menor que os informados
+        quality_controller = QualityController(
+            target_fps, levels=levels_from_settings(get_pipeline_settings())
+        )
+        print(f"Controle adaptativo de qualidade ativo (meta: {target_fps:.1f} frames/s)")
 
     frame_index = 0
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    output_every = max(1, int(output_every))
     out = None
 
-    os.makedirs("outputs", exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
+    video_out_path = os.path.join(output_dir, "annotated_video" + extension)
+    clips_dir = os.path.join(output_dir, "clips")
+
+    # Modo "clips": grava só trechos curtos em torno de eventos
+    event_detector = None
+    clip_writer = None
+    if output_mode == "clips":
+        event_detector = EventDetector(clip_events)
+        clip_writer = EventClipWriter(
+            clips_dir,
+            fps,
+            pre_roll_s=clip_pre_roll,
+            post_roll_s=clip_post_roll,
+            fourcc=fourcc,
+            extension=extension,
+        )
+        print(f"Salvando clipes de eventos ({', '.join(clip_events)}) em: {clips_dir}")
+
+    start_time = time.perf_counter()
+
+    frame_start = time.perf_counter()
 
     while True:
+        if max_frames is not None and frame_index >= max_frames:
+            break
+
+        # Custo do frame anterior (leitura, análise e escrita) para o controle adaptativo
+        now = time.perf_counter()
+        if quality_controller is not None and frame_index > 0:
+            adjustment = quality_controller.update(frame_index, now - frame_start)
+            if adjustment is not None:
+                set_pipeline_settings(**adjustment["settings"])
+                summary.log_quality_adjustment(adjustment)
+                print(f"[qualidade] frame {frame_index}: nível {adjustment['from_level']} -> "
+                      f"{adjustment['to_level']} ({adjustment['measured_fps']:.1f} frames/s)")
+        frame_start = now
+
         ret, frame = cap.read()
         if not ret:
             break
 
         frame_index += 1
+        allocation_tracker.begin_frame()
+        # Tempo do frame no vídeo; alguns backends não informam (0), então usa o FPS
+        pos_msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+        media_time_s = pos_msec / 1000.0 if pos_msec > 0 else (frame_index - 1) / fps
         
         if frame_index % 30 == 0:
             print(f"Processando frame {frame_index}...")
+            if progress_callback is not None:
+                progress_callback(frame_index, frame_count)
 
         # 1) Reconhecimento facial + 2) Emoções
-        faces_info, frame_with_faces = process_faces_and_emotions(frame)
+        faces_info = analyze_faces(frame)
 
         # 3) Detecção de atividades (nível global do vídeo)
         activity_label, motion_value = activity_detector.update(frame)
@@ -71,8 +221,18 @@ def main(video_path):
             frame_index=frame_index,
             faces_info=faces_info,
             activity_label=activity_label,
+            motion_value=motion_value,
+            media_time_s=media_time_s,
         )
 
+        # No modo full com decimação, frames não gravados nem são anotados
+        if output_mode == "none" or (output_mode == "full" and (frame_index - 1) % output_every):
+            allocation_tracker.end_frame()
+            continue
+
+        # Análise do frame concluída: anotações vão direto no buffer decodificado
+        frame_with_faces = draw_face_annotations(frame, faces_info)
+
         # Desenha info de atividade no frame
         text = f"Atividade: {activity_label}"
         cv2.putText(
@@ -85,32 +245,48 @@ def main(video_path):
             2,
         )
 
-        # Inicializa writer do vídeo de saída
+        if output_mode == "clips":
+            events = event_detector.detect(summary, activity_label, len(faces_info))
+            clip_writer.process(frame_index, frame_with_faces, events)
+            allocation_tracker.end_frame()
+            continue
+
+        # Inicializa writer do vídeo de saída (codifica em segundo plano)
         if out is None:
-            h, w, _ = frame.shape
-            out_path = "outputs/annotated_video.mp4"
-            out = cv2.VideoWriter(
-                out_path,
+            out = BackgroundVideoWriter(
+                video_out_path,
                 fourcc,
-                fps,
-                (w, h),
+                fps / output_every,
+                output_frame_size(frame.shape, output_scale),
             )
-            print(f"Salvando vídeo anotado em: {out_path}")
+            print(f"Salvando vídeo anotado em: {video_out_path} "
+                  f"({out.frame_size[0]}x{out.frame_size[1]}, {fps / output_every:.1f} FPS, {output_codec})")
 
         out.write(frame_with_faces)
+        allocation_tracker.end_frame()
 
         # Opcional: mostrar o frame durante o processamento (para debug)
         # cv2.imshow('Processamento', frame_with_faces)
         # if cv2.waitKey(1) & 0xFF == ord('q'):
         #     break
 
+    elapsed = time.perf_counter() - start_time
+    if quality_controller is not None:
+        summary.quality_level_frames = quality_controller.level_summary()
+    summary.set_mesh_stats(get_detection_stats(), mesh_max_interval)
+    set_pipeline_settings(**DEFAULT_PIPELINE_SETTINGS)
+
     cap.release()
     if out is not None:
-        out.release()
+        out.close()
+    clip_index_path = None
+    if clip_writer is not None:
+        clip_index_path = clip_writer.close(frame_index)
     cv2.destroyAllWindows()
+    allocation_tracker.stop()
 
     # 4) Geração de resumo automático
-    summary_path = "outputs/resumo_automatico.txt"
+    summary_path = os.path.join(output_dir, "resumo_automatico.txt")
     summary.export(summary_path)
 
     # Obter estatísticas de detecção
@@ -120,7 +296,14 @@ def main(video_path):
     print("ANÁLISE CONCLUÍDA!")
     print("="*60)
     print(f"Total de frames processados: {frame_index}")
-    print(f"Vídeo anotado salvo em: outputs/annotated_video.mp4")
+    print(f"Tempo de processamento: {elapsed:.1f}s ({frame_index/max(elapsed, 1e-9):.1f} frames/s)")
+    if output_mode == "full":
+        print(f"Vídeo anotado salvo em: {video_out_path}")
+        if out is not None:
+            print(f"Frames gravados: {out.frames_written} "
+                  f"(espera pelo codificador: {out.blocked_s:.1f}s)")
+    elif output_mode == "clips":
+        print(f"Clipes de eventos salvos: {len(clip_writer.clips)} (índice em {clip_index_path})")
     print(f"Resumo automático salvo em: {summary_path}")
     
     print("\n📊 ESTATÍSTICAS DE DETECÇÃO FACIAL")
@@ -133,6 +316,57 @@ def main(video_path):
     print(f"Detecções MediaPipe: {face_stats['mediapipe_detections']}")
     print(f"Detecções Haar Cascade: {face_stats['haar_detections']}")
     print(f"Mudanças de emoção detectadas: {face_stats['emotion_changes']}")
+    print(f"Face Mesh evitado em perfis (keypoints): {face_stats['mesh_skipped_profile']}")
+    print(f"Detecções reaproveitadas (intervalo): {face_stats['detections_reused']}")
+    print(f"Chamadas do Face Mesh: {face_stats['mesh_calls']} "
+          f"(evitadas em rostos estáveis: {face_stats['mesh_skipped_stable']})")
+    if quality_controller is not None:
+        print(f"Ajustes de qualidade: {len(quality_controller.adjustments)} "
+              f"(nível final {quality_controller.level})")
+
+    alloc_stats = allocation_tracker.report()
+    if alloc_stats:
+        print("\n🧠 ALOCAÇÕES DE MEMÓRIA POR FRAME")
+        print("-"*40)
+        print(f"Frames medidos: {alloc_stats['frames_measured']}")
+        print(f"Média por frame: {alloc_stats['avg_bytes_per_frame']/1024/1024:.2f} MB")
+        print(f"Mediana por frame: {alloc_stats['median_bytes_per_frame']/1024/1024:.2f} MB")
+        print(f"Máximo por frame: {alloc_stats['max_bytes_per_frame']/1024/1024:.2f} MB")
+
+    result = {
+        "video_path": video_path,
+        "preset": preset,
+        "fps": fps,
+        "frames": frame_index,
+        "frame_count": frame_count,
+        "elapsed_s": elapsed,
+        "frames_per_second": frame_index / max(elapsed, 1e-9),
+        "summary": summary,
+        "face_stats": face_stats,
+        "allocations": alloc_stats,
+        "summary_path": summary_path,
+        "video_out_path": video_out_path if output_mode == "full" else None,
+    }
+
+    if result_cache is not None:
+        result["cache_hit"] = False
+        output_files = [summary_path, summary_path.replace(".txt", "_detalhado.json")]
+        if output_mode == "full":
+            output_files.append(video_out_path)
+        elif output_mode == "clips":
+            # Só os clipes desta execução (os do índice), não o que mais houver na pasta
+            output_files.extend(os.path.join(clips_dir, clip["arquivo"]) for clip in clip_writer.clips)
+            output_files.append(clip_index_path)
+        if result_cache.store(cache_key, result, output_dir, output_files):
+            print(f"Resultado armazenado no cache: {cache_dir}")
+        print_cache_stats(result_cache.stats())
+
+    # 5) Indexação no banco SQLite de resultados
+    if db_path:
+        index_result(result, db_path)
+        print(f"Resultados indexados em: {db_path}")
+
+    return result
 
 
 if __name__ == "__main__":
@@ -143,5 +377,154 @@ if __name__ == "__main__":
         default="video_tech.mp4",
         help="Caminho para o arquivo de vídeo de entrada.",
     )
+    parser.add_argument(
+        "--preset",
+        choices=list(DETECTOR_PRESETS),
+        default=DEFAULT_PRESET,
+        help="Preset de detecção facial: fast (MediaPipe curto alcance), "
+             "balanced (MediaPipe + Haar, padrão), accurate (MediaPipe longo alcance + Haar fino).",
+    )
+    parser.add_argument(
+        "--output_dir",
+        type=str,
+        default="outputs",
+        help="Diretório onde vídeo, clipes e resumos são gravados.",
+    )
+    parser.add_argument(
+        "--max_frames",
+        type=int,
+        default=None,
+        help="Processa no máximo este número de frames.",
+    )
+    parser.add_argument(
+        "--detection_scale",
+        type=float,
+        default=1.0,
+        help="Fator de redução do frame enviado ao detector facial (ex.: 0.5).",
+    )
+    parser.add_argument(
+        "--detection_interval",
+        type=int,
+        default=1,
+        help="Roda o detector facial a cada N frames, reaproveitando as caixas entre eles.",
+    )
+    parser.add_argument(
+        "--no_mesh",
+        action="store_true",
+        help="Não usa o Face Mesh (emoções só por intensidade).",
+    )
+    parser.add_argument(
+        "--no_haar_fallback",
+        action="store_true",
+        help="Desativa o fallback Haar Cascade.",
+    )
+    parser.add_argument(
+        "--mesh_max_interval",
+        type=int,
+        default=DEFAULT_PIPELINE_SETTINGS['mesh_max_interval'],
+        help="Máximo de frames entre execuções do Face Mesh em um rosto estável (1 = todo frame).",
+    )
+    parser.add_argument(
+        "--target_fps",
+        type=float,
+        default=None,
+        help="Ativa o controle adaptativo de qualidade para manter esta meta de frames/s.",
+    )
+    parser.add_argument(
+        "--activity_width",
+        type=int,
+        default=0,
+        help="Reduz o frame da detecção de atividade para esta largura, ex.: 160 (padrão 0 = "
+             "resolução original). Usa os limiares calibrados para a largura mais próxima em "
+             "PROXY_MOTION_THRESHOLDS; os rótulos ainda podem diferir da resolução original.",
+    )
+    parser.add_argument(
+        "--db",
+        type=str,
+        default=None,
+        help="Banco SQLite onde o resultado é indexado (ex.: outputs/analises.sqlite).",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=None,
+        help="Cache de resultados por conteúdo do vídeo + configuração (ex.: outputs/cache).",
+    )
+    parser.add_argument(
+        "--cache_max_mb",
+        type=float,
+        default=DEFAULT_CACHE_MAX_MB,
+        help="Tamanho máximo do cache; as entradas usadas há mais tempo são removidas.",
+    )
+    parser.add_argument(
+        "--track_allocations",
+        action="store_true",
+        help="Mede e reporta a memória alocada por frame (tracemalloc).",
+    )
+    parser.add_argument(
+        "--output_mode",
+        choices=OUTPUT_MODES,
+        default="full",
+        help="full: vídeo anotado completo; clips: só clipes em torno de eventos; none: sem vídeo.",
+    )
+    parser.add_argument(
+        "--output_scale",
+        type=float,
+        default=1.0,
+        help="Escala do vídeo anotado em relação ao original (ex.: 0.5).",
+    )
+    parser.add_argument(
+        "--output_every",
+        type=int,
+        default=1,
+        help="Grava um frame a cada N no vídeo anotado (FPS de saída dividido por N).",
+    )
+    parser.add_argument(
+        "--output_codec",
+        choices=list(OUTPUT_CODECS),
+        default=DEFAULT_OUTPUT_CODEC,
+        help="Codec/contêiner do vídeo anotado e dos clipes (veja python src/video_writer.py).",
+    )
+    parser.add_argument(
+        "--clip_events",
+        type=str,
+        default=",".join(EVENT_TYPES),
+        help=f"Eventos que geram clipes, separados por vírgula ({', '.join(EVENT_TYPES)}).",
+    )
+    parser.add_argument(
+        "--clip_pre_roll",
+        type=float,
+        default=2.0,
+        help="Segundos gravados antes de cada evento (modo clips).",
+    )
+    parser.add_argument(
+        "--clip_post_roll",
+        type=float,
+        default=2.0,
+        help="Segundos gravados após o último evento de um clipe (modo clips).",
+    )
     args = parser.parse_args()
-    main(args.video_path)
\ No newline at end of file
+    main(
+        args.video_path,
+        track_allocations=args.track_allocations,
+        output_mode=args.output_mode,
+        clip_events=[e.strip() for e in args.clip_events.split(",") if e.strip()],
+        clip_pre_roll=args.clip_pre_roll,
+        clip_post_roll=args.clip_post_roll,
+        preset=args.preset,
+        output_dir=args.output_dir,
+        max_frames=args.max_frames,
+        db_path=args.db,
+        detection_scale=args.detection_scale,
+        detection_interval=args.detection_interval,
+        use_mesh=not args.no_mesh,
+        allow_haar_fallback=not args.no_haar_fallback,
+        mesh_max_interval=args.mesh_max_interval,
+        target_fps=args.target_fps,
+        activity_width=args.activity_width,
+        output_scale=args.output_scale,
+        output_every=args.output_every,
+        output_codec=args.output_codec,
+        cache_dir=args.cache_dir,
+        cache_max_mb=args.cache_max_mb,
+    )
\ No newline at end of file
@@ -0,0 +1,287 @@
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+# Adicione o diretório atual ao path para importar módulos locais
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from face_emotion import FaceModels, StreamState, analyze_faces, get_pipeline_settings
+from face_detectors import DETECTOR_PRESETS, DEFAULT_PRESET
+from activity_detection import ActivityDetector
+from summary import SummaryCollector
+
+
+class VideoStream:
+    """
+    Um fluxo de entrada (arquivo, câmera ou URL) com estado próprio de análise.
+
+    Uma thread leitora decodifica frames para uma fila limitada. Com a fila
+    cheia, fontes de arquivo bloqueiam (backpressure sobre a decodificação) e
+    fontes ao vivo descartam o frame mais antigo para não acumular atraso.
+    """
+
+    def __init__(self, name, source, max_queue=8, live=None):
+        self.name = name
+        self.source = source
+        self.cap = cv2.VideoCapture(source)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Não foi possível abrir a fonte '{source}'")
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps else 20.0
+        # Câmeras (índice inteiro) e URLs são tratadas como fontes ao vivo
+        self.live = live if live is not None else (
+            isinstance(source, int) or "://" in str(source)
+        )
+
+        self.frames = queue.Queue(maxsize=max_queue)
+        self.activity_detector = ActivityDetector()
+        self.summary = SummaryCollector(fps=self.fps)
+        self.state = StreamState()
+
+        self.busy = False
+        self.finished_reading = False
+        self.frame_index = 0          # Frames lidos
+        self.processed = 0            # Frames analisados
+        self.dropped = 0
+        self.lags = deque(maxlen=5000)  # Atrasos recentes (s) entre leitura e fim da análise
+        self.start_time = None
+        self.end_time = None
+        self.last_done_at = None        # Fim da análise do último frame
+
+    def reader_loop(self, scheduler):
+        self.start_time = time.perf_counter()
+        while not scheduler.stopping:
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            self.frame_index += 1
+            # Fontes ao vivo não têm tempo de vídeo confiável; o resumo usa o FPS
+            pos_msec = 0.0 if self.live else self.cap.get(cv2.CAP_PROP_POS_MSEC)
+            media_time_s = pos_msec / 1000.0 if pos_msec > 0 else None
+            item = (self.frame_index, frame, media_time_s, time.perf_counter())
+            if self.live:
+                while True:
+                    try:
+                        self.frames.put_nowait(item)
+                        break
+                    except queue.Full:
+                        try:
+                            self.frames.get_nowait()
+                            self.dropped += 1
+                        except queue.Empty:
+                            pass
+            else:
+                while not scheduler.stopping:
+                    try:
+                        self.frames.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+            scheduler.notify()
+        self.cap.release()
+        scheduler.finish_reading(self)
+
+    @property
+    def done(self):
+        return self.finished_reading and self.frames.empty() and not self.busy
+
+    def report(self):
+        elapsed = ((self.end_time or time.perf_counter()) - self.start_time) if self.start_time else 0.0
+        lags = np.asarray(self.lags) if self.lags else np.zeros(1)
+        stats = self.state.stats
+        return {
+            "stream": self.name,
+            "source": str(self.source),
+            "frames_read": self.frame_index,
+            "frames_processed": self.processed,
+            "frames_dropped": self.dropped,
+            "frames_per_second": self.processed / max(elapsed, 1e-9),
+            "avg_lag_s": float(lags.mean()),
+            "max_lag_s": float(lags.max()),
+            "p95_lag_s": float(np.percentile(lags, 95)),
+            "face_detection_rate": stats["frames_with_faces"] / max(1, stats["total_frames"]),
+            "mesh_calls": stats["mesh_calls"],
+            "mesh_skipped_stable": stats["mesh_skipped_stable"],
+        }
+
+
+class FairScheduler:
+    """
+    Distribui frames dos fluxos entre os workers em round-robin.
+
+    Cada fluxo tem no máximo um frame em análise por vez (ActivityDetector e
+    SummaryCollector dependem da ordem dos frames), e a varredura recomeça
+    depois do último fluxo atendido, então nenhum fluxo monopoliza o pool.
+    """
+
+    def __init__(self, streams):
+        self.streams = streams
+        self.next_index = 0
+        self.condition = threading.Condition()
+        self.stopping = False
+
+    def notify(self):
+        with self.condition:
+            self.condition.notify_all()
+
+    def next_task(self):
+        """Bloqueia até haver um frame disponível; retorna None quando tudo terminou"""
+        with self.condition:
+            while True:
+                if self.stopping:
+                    return None
+                n = len(self.streams)
+                for offset in range(n):
+                    stream = self.streams[(self.next_index + offset) % n]
+                    if stream.busy:
+                        continue
+                    try:
+                        item = stream.frames.get_nowait()
+                    except queue.Empty:
+                        continue
+                    stream.busy = True
+                    self.next_index = (self.next_index + offset + 1) % n
+                    return stream, item
+                if all(stream.done for stream in self.streams):
+                    return None
+                self.condition.wait(timeout=0.1)
+
+    def task_done(self, stream):
+        with self.condition:
+            stream.busy = False
+            stream.last_done_at = time.perf_counter()
+            if stream.finished_reading and stream.frames.empty():
+                stream.end_time = stream.last_done_at
+            self.condition.notify_all()
+
+    def finish_reading(self, stream):
+        """Marca o fim da leitura; se o último frame já foi analisado, fecha o tempo do fluxo"""
+        with self.condition:
+            stream.finished_reading = True
+            if stream.frames.empty() and not stream.busy:
+                stream.end_time = stream.last_done_at or time.perf_counter()
+            self.condition.notify_all()
+
+
+def worker_loop(scheduler, models):
+    """Worker do pool: usa sempre o mesmo conjunto de modelos"""
+    while True:
+        task = scheduler.next_task()
+        if task is None:
+            return
+        stream, (frame_index, frame, media_time_s, captured_at) = task
+        try:
+            faces_info = analyze_faces(frame, models=models, state=stream.state)
+            activity_label, motion_value = stream.activity_detector.update(frame)
+            stream.summary.update(
+                frame_index=frame_index,
+                faces_info=faces_info,
+                activity_label=activity_label,
+                motion_value=motion_value,
+                media_time_s=media_time_s,
+            )
+            stream.processed += 1
+            stream.lags.append(time.perf_counter() - captured_at)
+        except Exception as e:
+            print(f"[{stream.name}] erro no frame {frame_index}: {e}")
+        finally:
+            scheduler.task_done(stream)
+
+
+def parse_source(source):
+    return int(source) if source.isdigit() else source
+
+
+def run_streams(sources, workers=2, preset=DEFAULT_PRESET, max_queue=8,
+                output_dir="outputs/streams", report_interval=10.0):
+    """Analisa vários fluxos em um processo com um pool limitado de modelos"""
+    streams = [
+        VideoStream(f"stream{i + 1}", parse_source(source), max_queue=max_queue)
+        for i, source in enumerate(sources)
+    ]
+    scheduler = FairScheduler(streams)
+
+    print(f"Analisando {len(streams)} fluxo(s) com {workers} conjunto(s) de modelos ({preset})")
+    model_pool = [FaceModels(preset) for _ in range(workers)]
+
+    readers = [
+        threading.Thread(target=stream.reader_loop, args=(scheduler,), daemon=True)
+        for stream in streams
+    ]
+    worker_threads = [
+        threading.Thread(target=worker_loop, args=(scheduler, models), daemon=True)
+        for models in model_pool
+    ]
+    for thread in readers + worker_threads:
+        thread.start()
+
+    try:
+        last_report = time.perf_counter()
+        while any(thread.is_alive() for thread in worker_threads):
+            time.sleep(0.2)
+            if time.perf_counter() - last_report >= report_interval:
+                last_report = time.perf_counter()
+                for stream in streams:
+                    r = stream.report()
+                    print(f"[{r['stream']}] {r['frames_processed']} frames, "
+                          f"{r['frames_per_second']:.1f} frames/s, atraso médio {r['avg_lag_s']:.2f}s, "
+                          f"fila {stream.frames.qsize()}, descartados {r['frames_dropped']}")
+    except KeyboardInterrupt:
+        print("Interrompendo fluxos...")
+        scheduler.stopping = True
+        scheduler.notify()
+    finally:
+        for thread in worker_threads:
+            thread.join()
+        for models in model_pool:
+            models.close()
+
+    reports = []
+    print("\n" + "=" * 60)
+    print("FLUXOS CONCLUÍDOS")
+    print("=" * 60)
+    for stream in streams:
+        stream_dir = os.path.join(output_dir, stream.name)
+        os.makedirs(stream_dir, exist_ok=True)
+        stream.summary.set_mesh_stats(stream.state.stats, get_pipeline_settings()['mesh_max_interval'])
+        stream.summary.export(os.path.join(stream_dir, "resumo_automatico.txt"))
+        r = stream.report()
+        reports.append(r)
+        print(f"{r['stream']} ({r['source']}): {r['frames_processed']}/{r['frames_read']} frames, "
+              f"{r['frames_per_second']:.1f} frames/s, atraso médio {r['avg_lag_s']:.2f}s "
+              f"(p95 {r['p95_lag_s']:.2f}s, máx {r['max_lag_s']:.2f}s), "
+              f"descartados {r['frames_dropped']}, detecção {r['face_detection_rate']:.1%}, "
+              f"Face Mesh {r['mesh_calls']} (evitadas {r['mesh_skipped_stable']})")
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Analisa vários vídeos/câmeras em um único processo."
+    )
+    parser.add_argument("sources", nargs="+",
+                        help="Arquivos, índices de câmera (0, 1...) ou URLs (rtsp://...).")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="Número de conjuntos de modelos compartilhados entre os fluxos.")
+    parser.add_argument("--preset", choices=list(DETECTOR_PRESETS), default=DEFAULT_PRESET)
+    parser.add_argument("--max_queue", type=int, default=8,
+                        help="Frames decodificados em espera por fluxo (backpressure).")
+    parser.add_argument("--output_dir", type=str, default="outputs/streams")
+    parser.add_argument("--report_interval", type=float, default=10.0,
+                        help="Segundos entre relatórios parciais de vazão e atraso.")
+    args = parser.parse_args()
+    run_streams(
+        args.sources,
+        workers=args.workers,
+        preset=args.preset,
+        max_queue=args.max_queue,
+        output_dir=args.output_dir,
+        report_interval=args.report_interval,
+    )
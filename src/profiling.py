@@ -0,0 +1,56 @@
+import tracemalloc
+
+import numpy as np
+
+
+class AllocationTracker:
+    """
+    Mede a memória alocada por frame usando tracemalloc.
+
+    Para cada frame registra o pico de memória acima do nível em que o frame
+    começou (alocações transitórias, como cópias de frame e conversões de cor).
+    Arrays do NumPy e as saídas do OpenCV são rastreados pelo tracemalloc.
+    A medição tem custo, por isso só é ativada quando solicitada.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.per_frame_bytes = []
+        self._frame_start = 0
+        self._started_here = False
+
+    def start(self):
+        if not self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_here = True
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        tracemalloc.reset_peak()
+        self._frame_start, _ = tracemalloc.get_traced_memory()
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        _, peak = tracemalloc.get_traced_memory()
+        self.per_frame_bytes.append(max(0, peak - self._frame_start))
+
+    def stop(self):
+        if self.enabled and self._started_here:
+            tracemalloc.stop()
+            self._started_here = False
+
+    def report(self):
+        """Retorna estatísticas de alocação por frame (bytes)"""
+        if not self.per_frame_bytes:
+            return {}
+        values = np.asarray(self.per_frame_bytes, dtype=np.float64)
+        return {
+            "frames_measured": len(values),
+            "avg_bytes_per_frame": float(values.mean()),
+            "median_bytes_per_frame": float(np.median(values)),
+            "max_bytes_per_frame": float(values.max()),
+        }
@@ -0,0 +1,109 @@
+from collections import defaultdict
+
+# Níveis de qualidade, do mais preciso ao mais rápido. Cada nível é um conjunto
+# completo de ajustes para face_emotion.set_pipeline_settings.
+QUALITY_LEVELS = (
+    {"detection_scale": 1.0, "detection_interval": 1, "use_mesh": True, "allow_haar_fallback": True},
+    {"detection_scale": 1.0, "detection_interval": 1, "use_mesh": True, "allow_haar_fallback": False},
+    {"detection_scale": 0.75, "detection_interval": 1, "use_mesh": True, "allow_haar_fallback": False},
+    {"detection_scale": 0.75, "detection_interval": 2, "use_mesh": True, "allow_haar_fallback": False},
+    {"detection_scale": 0.5, "detection_interval": 2, "use_mesh": True, "allow_haar_fallback": False},
+    {"detection_scale": 0.5, "detection_interval": 3, "use_mesh": True, "allow_haar_fallback": False},
+    {"detection_scale": 0.5, "detection_interval": 4, "use_mesh": False, "allow_haar_fallback": False},
+)
+
+
+def levels_from_settings(settings, levels=QUALITY_LEVELS):
+    """Níveis limitados pelos ajustes fixos do usuário.
+
+    Nenhum nível reativa o Face Mesh ou o fallback Haar desligados, usa
+    escala maior ou intervalo menor que os informados. O nível 0 é o
+    próprio ajuste fixo; níveis que ficam iguais ao anterior são descartados.
+    """
+    bounded = []
+    for level in levels:
+        candidate = {
+            "detection_scale": min(level["detection_scale"], settings["detection_scale"]),
+            "detection_interval": max(level["detection_interval"], settings["detection_interval"]),
+            "use_mesh": level["use_mesh"] and settings["use_mesh"],
+            "allow_haar_fallback": level["allow_haar_fallback"] and settings["allow_haar_fallback"],
+        }
+        if not bounded or candidate != bounded[-1]:
+            bounded.append(candidate)
+    return tuple(bounded)
+
+
+class QualityController:
+    """
+    Ajusta a qualidade da análise para manter uma meta de frames por segundo.
+
+    Acompanha o custo por frame com média móvel exponencial. Se o FPS medido
+    fica abaixo da meta (menos a histerese), desce um nível de qualidade; se
+    sobra folga suficiente, sobe um nível. Depois de cada mudança espera
+    `cooldown_frames` para medir o efeito antes de decidir de novo. Para
+    partir de ajustes fixos, use `levels=levels_from_settings(ajustes)`.
+    """
+
+    def __init__(self, target_fps, levels=QUALITY_LEVELS, hysteresis=0.1,
+                 headroom=0.3, cooldown_frames=30, smoothing=0.1):
+        self.target_fps = target_fps
+        self.levels = levels
+        self.hysteresis = hysteresis
+        self.headroom = headroom
+        self.cooldown_frames = cooldown_frames
+        self.smoothing = smoothing
+
+        self.level = 0
+        self.avg_frame_time = None
+        self.frames_since_change = 0
+        self.level_frames = defaultdict(int)
+        self.adjustments = []
+
+    @property
+    def settings(self):
+        return dict(self.levels[self.level])
+
+    @property
+    def measured_fps(self):
+        if not self.avg_frame_time:
+            return 0.0
+        return 1.0 / self.avg_frame_time
+
+    def update(self, frame_index, frame_time_s):
+        """Registra o custo do frame; retorna o novo ajuste se o nível mudar, senão None"""
+        self.level_frames[self.level] += 1
+        self.frames_since_change += 1
+        if self.avg_frame_time is None:
+            self.avg_frame_time = frame_time_s
+        else:
+            self.avg_frame_time += self.smoothing * (frame_time_s - self.avg_frame_time)
+
+        if self.frames_since_change < self.cooldown_frames:
+            return None
+
+        fps = self.measured_fps
+        new_level = self.level
+        if fps < self.target_fps * (1 - self.hysteresis) and self.level < len(self.levels) - 1:
+            new_level = self.level + 1
+        elif fps > self.target_fps * (1 + self.headroom) and self.level > 0:
+            new_level = self.level - 1
+
+        if new_level == self.level:
+            return None
+
+        adjustment = {
+            "frame": frame_index,
+            "measured_fps": round(fps, 2),
+            "target_fps": self.target_fps,
+            "from_level": self.level,
+            "to_level": new_level,
+            "settings": dict(self.levels[new_level]),
+        }
+        self.adjustments.append(adjustment)
+        self.level = new_level
+        self.frames_since_change = 0
+        return adjustment
+
+    def level_summary(self):
+        """Frames processados em cada nível (para interpretar a qualidade do resultado)"""
+        return {level: count for level, count in sorted(self.level_frames.items())}
@@ -0,0 +1,224 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+# Adicione o diretório atual ao path para importar módulos locais
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from face_records import EMOTIONS
+from activity_detection import DEFAULT_PROXY_WIDTH
+import main as pipeline
+
+# Rótulos da matriz de confusão: emoções + frame sem rosto (código -1 -> última coluna)
+SEQUENCE_LABELS = EMOTIONS + ("sem_rosto",)
+
+# Configuração de referência e configurações rápidas (kwargs de main.main). Cada
+# configuração rápida é aplicada sobre a referência: só o ajuste listado muda
+REFERENCE_CONFIG = {"preset": "balanced", "mesh_max_interval": 1, "activity_width": 0}
+SPEED_CONFIGS = {
+    "fast": {"preset": "fast"},
+    "accurate": {"preset": "accurate"},
+    "half_res": {"detection_scale": 0.5},
+    "interval_3": {"detection_interval": 3},
+    "no_mesh": {"use_mesh": False},
+    "no_haar": {"allow_haar_fallback": False},
+    "adaptive_mesh": {"mesh_max_interval": 6},
+    "activity_proxy": {"activity_width": DEFAULT_PROXY_WIDTH},
+}
+
+
+def run_config(video_path, config, max_frames=None):
+    """Executa main.main com a configuração dada, sem gravar vídeo"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        return pipeline.main(
+            video_path,
+            output_mode="none",
+            output_dir=output_dir,
+            max_frames=max_frames,
+            **config,
+        )
+
+
+def distribution_distance(reference_counts, counts):
+    """Distância de variação total (0 = idênticas, 1 = disjuntas) entre duas distribuições"""
+    keys = set(reference_counts) | set(counts)
+    ref_total = max(1, sum(reference_counts.values()))
+    total = max(1, sum(counts.values()))
+    return 0.5 * sum(
+        abs(reference_counts.get(k, 0) / ref_total - counts.get(k, 0) / total) for k in keys
+    )
+
+
+def sequence_confusion(reference_seq, seq):
+    """Matriz de confusão (linhas = referência, colunas = configuração) das emoções por frame"""
+    n = min(len(reference_seq), len(seq))
+    ref = np.frombuffer(reference_seq, dtype=np.int8)[:n].astype(np.int64)
+    cur = np.frombuffer(seq, dtype=np.int8)[:n].astype(np.int64)
+    # -1 (sem rosto) vira o último índice
+    n_labels = len(SEQUENCE_LABELS)
+    ref[ref < 0] = n_labels - 1
+    cur[cur < 0] = n_labels - 1
+    return np.bincount(ref * n_labels + cur, minlength=n_labels * n_labels).reshape(n_labels, n_labels)
+
+
+def label_agreement(reference_seq, seq):
+    """Fração de frames com o mesmo código (ex.: atividade por frame)"""
+    n = min(len(reference_seq), len(seq))
+    if n == 0:
+        return 0.0
+    ref = np.frombuffer(reference_seq, dtype=np.int8)[:n]
+    cur = np.frombuffer(seq, dtype=np.int8)[:n]
+    return float(np.mean(ref == cur))
+
+
+def compare_results(reference, result):
+    """Compara a saída de uma configuração com a referência"""
+    ref_summary = reference["summary"]
+    summary = result["summary"]
+    confusion = sequence_confusion(ref_summary.emotion_per_frame, summary.emotion_per_frame)
+    frames_compared = int(confusion.sum())
+    ref_rate = ref_summary.calculate_metrics()["face_detection_rate"]
+    rate = summary.calculate_metrics()["face_detection_rate"]
+    return {
+        "frames_per_second": result["frames_per_second"],
+        "speedup": result["frames_per_second"] / max(reference["frames_per_second"], 1e-9),
+        "frames_compared": frames_compared,
+        "agreement": float(np.trace(confusion)) / max(1, frames_compared),
+        "confusion": confusion,
+        "emotion_distance": distribution_distance(ref_summary.emotion_counts, summary.emotion_counts),
+        "activity_distance": distribution_distance(dict(ref_summary.activity_counts),
+                                                   dict(summary.activity_counts)),
+        "activity_agreement": label_agreement(ref_summary.activity_per_frame,
+                                              summary.activity_per_frame),
+        "face_detection_rate": rate,
+        "face_detection_rate_delta": rate - ref_rate,
+    }
+
+
+def print_confusion(confusion):
+    """Mostra apenas as linhas/colunas com algum frame"""
+    used = np.flatnonzero(confusion.sum(axis=0) + confusion.sum(axis=1))
+    labels = [SEQUENCE_LABELS[i][:10] for i in used]
+    print(" " * 12 + "".join(f"{label:>11}" for label in labels))
+    for i in used:
+        row = "".join(f"{confusion[i, j]:>11}" for j in used)
+        print(f"{SEQUENCE_LABELS[i][:10]:<12}{row}")
+
+
+def run_regression(video_paths, configs, reference_config=REFERENCE_CONFIG,
+                   threshold=0.9, max_frames=None, show_confusion=False):
+    """Roda referência e configurações rápidas em cada vídeo e retorna o relatório.
+
+    `passed` é False se a concordância agregada de alguma configuração ficar
+    abaixo de `threshold`.
+    """
+    report = {"threshold": threshold, "reference": reference_config, "videos": {}, "configs": {}}
+    totals = {name: np.zeros((len(SEQUENCE_LABELS),) * 2, dtype=np.int64) for name in configs}
+    fps_values = {name: [] for name in configs}
+
+    for video_path in video_paths:
+        reference = run_config(video_path, reference_config, max_frames)
+        if reference is None:
+            print(f"Falha ao processar {video_path}; vídeo ignorado.")
+            continue
+        video_report = {"reference_frames_per_second": reference["frames_per_second"], "configs": {}}
+
+        for name, config in configs.items():
+            result = run_config(video_path, {**reference_config, **config}, max_frames)
+            if result is None:
+                continue
+            comparison = compare_results(reference, result)
+            totals[name] += comparison["confusion"]
+            fps_values[name].append(comparison["frames_per_second"])
+            comparison["confusion"] = comparison["confusion"].tolist()
+            video_report["configs"][name] = comparison
+        report["videos"][video_path] = video_report
+
+    print("\n" + "=" * 84)
+    print("REGRESSÃO VELOCIDADE x PRECISÃO")
+    print("=" * 84)
+    print(f"Referência: {reference_config}  |  limiar de concordância: {threshold:.0%}")
+    for video_path, video_report in report["videos"].items():
+        print(f"\n🎬 {video_path} (referência: {video_report['reference_frames_per_second']:.1f} frames/s)")
+        print(f"{'config':<14} {'frames/s':>9} {'speedup':>8} {'concord.':>9} "
+              f"{'Δemoções':>9} {'Δativid.':>9} {'conc.ativ.':>10} {'detecção':>9} {'Δdetec.':>8}")
+        for name, c in video_report["configs"].items():
+            print(f"{name:<14} {c['frames_per_second']:>9.1f} {c['speedup']:>7.2f}x "
+                  f"{c['agreement']:>9.1%} {c['emotion_distance']:>9.3f} "
+                  f"{c['activity_distance']:>9.3f} {c['activity_agreement']:>10.1%} "
+                  f"{c['face_detection_rate']:>9.1%} {c['face_detection_rate_delta']:>+8.1%}")
+
+    passed = True
+    print("\n📋 RESULTADO AGREGADO")
+    print("-" * 40)
+    for name, confusion in totals.items():
+        frames = int(confusion.sum())
+        agreement = float(np.trace(confusion)) / max(1, frames)
+        ok = agreement >= threshold
+        passed = passed and ok
+        mean_fps = float(np.mean(fps_values[name])) if fps_values[name] else 0.0
+        report["configs"][name] = {
+            "config": configs[name],
+            "frames_compared": frames,
+            "agreement": agreement,
+            "mean_frames_per_second": mean_fps,
+            "passed": ok,
+            "confusion": confusion.tolist(),
+        }
+        status = "OK" if ok else "FALHOU"
+        print(f"{name:<12} concordância {agreement:.1%} em {frames} frames, "
+              f"{mean_fps:.1f} frames/s -> {status}")
+        if show_confusion:
+            print_confusion(confusion)
+
+    report["passed"] = passed
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compara configurações rápidas com a configuração de referência."
+    )
+    parser.add_argument("--video_paths", nargs="+", default=["video_tech.mp4"])
+    parser.add_argument(
+        "--configs",
+        type=str,
+        default=",".join(SPEED_CONFIGS),
+        help=f"Configurações a comparar, separadas por vírgula ({', '.join(SPEED_CONFIGS)}).",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.9,
+        help="Concordância mínima por frame (0-1); abaixo disso o script termina com erro.",
+    )
+    parser.add_argument("--max_frames", type=int, default=None)
+    parser.add_argument("--show_confusion", action="store_true",
+                        help="Mostra a matriz de confusão agregada de cada configuração.")
+    parser.add_argument("--report_json", type=str, default=None,
+                        help="Grava o relatório completo (com matrizes de confusão) em JSON.")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.configs.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SPEED_CONFIGS]
+    if unknown:
+        parser.error(f"Configurações desconhecidas: {', '.join(unknown)}")
+
+    report = run_regression(
+        args.video_paths,
+        {name: SPEED_CONFIGS[name] for name in names},
+        threshold=args.threshold,
+        max_frames=args.max_frames,
+        show_confusion=args.show_confusion,
+    )
+
+    if args.report_json:
+        with open(args.report_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Relatório salvo em: {args.report_json}")
+
+    sys.exit(0 if report["passed"] else 1)
@@ -0,0 +1,307 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+# Adicione o diretório atual ao path para importar módulos locais
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_CACHE_DIR = "outputs/cache"
+DEFAULT_CACHE_MAX_MB = 2048
+
+# Módulos cujo código entra na impressão digital da configuração: mudar
+# limiares, detectores, o formato do resumo ou as saídas gravadas (vídeo
+# anotado, clipes, dict de resultado) invalida o cache
+CODE_MODULES = (
+    "face_emotion.py",
+    "face_tracking.py",
+    "face_detectors.py",
+    "face_records.py",
+    "activity_detection.py",
+    "summary.py",
+    "timeline.py",
+    "main.py",
+    "event_clips.py",
+    "video_writer.py",
+)
+
+# Amostragem do conteúdo do vídeo: blocos espaçados ao longo do arquivo
+SAMPLE_CHUNKS = 16
+SAMPLE_CHUNK_SIZE = 256 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    video_path TEXT,
+    size_bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used_at);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def video_content_hash(video_path, chunks=SAMPLE_CHUNKS, chunk_size=SAMPLE_CHUNK_SIZE):
+    """Hash do tamanho do arquivo e de blocos amostrados (início, fim e meio).
+
+    Arquivos pequenos são lidos inteiros.
+    """
+    size = os.path.getsize(video_path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(video_path, "rb") as f:
+        if size <= chunks * chunk_size:
+            digest.update(f.read())
+        else:
+            step = (size - chunk_size) / (chunks - 1)
+            for i in range(chunks):
+                f.seek(int(i * step))
+                digest.update(f.read(chunk_size))
+    return digest.hexdigest()
+
+
+def code_fingerprint(modules=CODE_MODULES):
+    """Hash do código-fonte dos módulos de análise"""
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for module in modules:
+        with open(os.path.join(base_dir, module), "rb") as f:
+            digest.update(module.encode())
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def config_fingerprint(options):
+    """Hash das opções da análise (com os parâmetros do preset) e do código"""
+    from face_detectors import DETECTOR_PRESETS
+
+    config = dict(options)
+    preset = config.get("preset")
+    if preset in DETECTOR_PRESETS:
+        config["preset_settings"] = DETECTOR_PRESETS[preset]
+    payload = json.dumps(config, sort_keys=True, default=str) + code_fingerprint()
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Cache de resultados de main.main em disco, endereçado por conteúdo.
+
+    Cada entrada guarda o dict de resultado (com o SummaryCollector) e as
+    saídas geradas (resumos, vídeo anotado, clipes). O índice SQLite guarda
+    tamanho e último uso; acima de `max_mb` as entradas usadas há mais tempo
+    são removidas.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_mb=DEFAULT_CACHE_MAX_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db_path = os.path.join(cache_dir, "cache.sqlite")
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode = WAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _count(self, conn, name):
+        conn.execute(
+            "INSERT INTO counters VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def key(self, video_path, options):
+        return hashlib.sha256(
+            (video_content_hash(video_path) + config_fingerprint(options)).encode()
+        ).hexdigest()
+
+    def load(self, key, output_dir):
+        """Copia as saídas guardadas para `output_dir` e retorna o resultado, ou None.
+
+        O resultado vem com `cache_hit=True`; `elapsed_s` passa a ser o tempo
+        desta carga e `frames_per_second` fica None (não houve análise). Os
+        tempos da execução original ficam em `original_elapsed_s` e
+        `original_frames_per_second`.
+        """
+        start = time.perf_counter()
+        entry_dir = self._entry_dir(key)
+        with self._connection() as conn:
+            row = conn.execute("SELECT key FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or not os.path.isdir(entry_dir):
+                if row is not None:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._count(conn, "misses")
+                return None
+
+        # Outro processo pode despejar a entrada entre a consulta e a leitura
+        # (ou a entrada pode estar corrompida): nesse caso vale como miss
+        try:
+            with open(os.path.join(entry_dir, "result.pkl"), "rb") as f:
+                result = pickle.load(f)
+            outputs_dir = os.path.join(entry_dir, "outputs")
+            os.makedirs(output_dir, exist_ok=True)
+            shutil.copytree(outputs_dir, output_dir, dirs_exist_ok=True)
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            print(f"Entrada do cache indisponível ({e}); recalculando.")
+            with self._connection() as conn:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._count(conn, "misses")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+
+        with self._connection() as conn:
+            self._count(conn, "hits")
+            conn.execute(
+                "UPDATE entries SET last_used_at = ?, hits = hits + 1 WHERE key = ?",
+                (time.time(), key),
+            )
+        for field in ("summary_path", "video_out_path"):
+            if result.get(field):
+                result[field] = os.path.join(output_dir, result[field])
+        result["cache_hit"] = True
+        result["original_elapsed_s"] = result.get("elapsed_s")
+        result["original_frames_per_second"] = result.get("frames_per_second")
+        result["elapsed_s"] = time.perf_counter() - start
+        result["frames_per_second"] = None
+        return result
+
+    def store(self, key, result, output_dir, output_files):
+        """Guarda o resultado e as saídas listadas (caminhos dentro de `output_dir`)"""
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp_", dir=self.cache_dir)
+        try:
+            outputs_dir = os.path.join(tmp_dir, "outputs")
+            os.makedirs(outputs_dir)
+            for path in output_files:
+                if not path or not os.path.exists(path):
+                    continue
+                target = os.path.join(outputs_dir, os.path.relpath(path, output_dir))
+                if os.path.isdir(path):
+                    shutil.copytree(path, target)
+                else:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.copy2(path, target)
+
+            # Caminhos de saída ficam relativos; load() os reancora no novo output_dir
+            cached = dict(result)
+            for field in ("summary_path", "video_out_path"):
+                if cached.get(field):
+                    cached[field] = os.path.relpath(cached[field], output_dir)
+            with open(os.path.join(tmp_dir, "result.pkl"), "wb") as f:
+                pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            size = sum(
+                os.path.getsize(os.path.join(root, name))
+                for root, _, names in os.walk(tmp_dir) for name in names
+            )
+            if size > self.max_bytes:
+                print(f"Resultado ({size / 1024 / 1024:.1f} MB) maior que o cache; não armazenado.")
+                return False
+
+            entry_dir = self._entry_dir(key)
+            os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+            if os.path.isdir(entry_dir):
+                shutil.rmtree(entry_dir)
+            os.replace(tmp_dir, entry_dir)
+        finally:
+            if os.path.isdir(tmp_dir):
+                shutil.rmtree(tmp_dir)
+
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, video_path, size_bytes, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, os.path.abspath(result["video_path"]), size, now, now),
+            )
+        self.evict()
+        return True
+
+    def evict(self, max_bytes=None):
+        """Remove as entradas usadas há mais tempo até o total caber em `max_bytes`"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        removed = 0
+        with self._connection() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM entries").fetchone()[0]
+            if total <= max_bytes:
+                return 0
+            for key, size in conn.execute(
+                "SELECT key, size_bytes FROM entries ORDER BY last_used_at"
+            ).fetchall():
+                if total <= max_bytes:
+                    break
+                entry_dir = self._entry_dir(key)
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                try:
+                    os.rmdir(os.path.dirname(entry_dir))  # Remove o prefixo se ficou vazio
+                except OSError:
+                    pass
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                removed += 1
+                self._count(conn, "evictions")
+        return removed
+
+    def stats(self):
+        with self._connection() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM entries"
+            ).fetchone()
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        return {
+            "entries": entries,
+            "size_mb": size / 1024 / 1024,
+            "max_mb": self.max_bytes / 1024 / 1024,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / max(1, hits + misses),
+            "evictions": counters.get("evictions", 0),
+        }
+
+
+def print_stats(stats):
+    print(f"Entradas: {stats['entries']} ({stats['size_mb']:.1f} / {stats['max_mb']:.0f} MB)")
+    print(f"Acertos: {stats['hits']}  Falhas: {stats['misses']}  "
+          f"Taxa de acerto: {stats['hit_rate']:.1%}  Remoções: {stats['evictions']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Administra o cache de resultados.")
+    parser.add_argument("--cache_dir", type=str, default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--cache_max_mb", type=float, default=DEFAULT_CACHE_MAX_MB)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Mostra tamanho, entradas e taxa de acerto.")
+    evict_parser = subparsers.add_parser("evict", help="Remove entradas antigas até caber no limite.")
+    evict_parser.add_argument("--max_mb", type=float, default=None,
+                              help="Limite desejado (padrão: --cache_max_mb; 0 esvazia o cache).")
+    args = parser.parse_args()
+
+    cache = ResultCache(args.cache_dir, args.cache_max_mb)
+    if args.command == "stats":
+        print_stats(cache.stats())
+    elif args.command == "evict":
+        max_bytes = None if args.max_mb is None else int(args.max_mb * 1024 * 1024)
+        print(f"Entradas removidas: {cache.evict(max_bytes)}")
+        print_stats(cache.stats())
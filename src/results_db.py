@@ -0,0 +1,356 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Adicione o diretório atual ao path para importar módulos locais
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from face_records import EMOTIONS
+
+DEFAULT_DB_PATH = "outputs/analises.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY,
+    video_path TEXT NOT NULL,
+    analyzed_at TEXT NOT NULL,
+    preset TEXT,
+    fps REAL,
+    total_frames INTEGER,
+    duration_s REAL,
+    face_detection_rate REAL,
+    avg_faces_per_frame REAL,
+    avg_detection_confidence REAL,
+    emotional_stability REAL,
+    total_faces INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_videos_path ON videos(video_path);
+CREATE INDEX IF NOT EXISTS idx_videos_analyzed_at ON videos(analyzed_at);
+
+CREATE TABLE IF NOT EXISTS video_emotions (
+    video_id INTEGER NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+    emotion TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    fraction REAL NOT NULL,
+    PRIMARY KEY (video_id, emotion)
+);
+CREATE INDEX IF NOT EXISTS idx_video_emotions_emotion ON video_emotions(emotion, fraction);
+
+CREATE TABLE IF NOT EXISTS video_activities (
+    video_id INTEGER NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+    activity TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    fraction REAL NOT NULL,
+    PRIMARY KEY (video_id, activity)
+);
+CREATE INDEX IF NOT EXISTS idx_video_activities_activity ON video_activities(activity, fraction);
+
+CREATE TABLE IF NOT EXISTS timeline (
+    video_id INTEGER NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+    second INTEGER NOT NULL,
+    frames INTEGER NOT NULL,
+    frames_with_faces INTEGER NOT NULL,
+    dominant_emotion TEXT,
+    dominant_activity TEXT,
+    avg_faces REAL,
+    avg_motion REAL,
+    PRIMARY KEY (video_id, second)
+);
+
+CREATE TABLE IF NOT EXISTS timeline_emotions (
+    video_id INTEGER NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+    second INTEGER NOT NULL,
+    emotion TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (video_id, second, emotion)
+);
+CREATE INDEX IF NOT EXISTS idx_timeline_emotions_emotion ON timeline_emotions(emotion);
+
+CREATE TABLE IF NOT EXISTS emotion_spans (
+    video_id INTEGER NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+    track_id INTEGER NOT NULL,
+    emotion TEXT NOT NULL,
+    start_frame INTEGER NOT NULL,
+    end_frame INTEGER NOT NULL,
+    start_s REAL NOT NULL,
+    end_s REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_emotion_spans_video ON emotion_spans(video_id, track_id);
+CREATE INDEX IF NOT EXISTS idx_emotion_spans_emotion ON emotion_spans(emotion);
+"""
+
+
+def connect(db_path=DEFAULT_DB_PATH):
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(SCHEMA)
+    _migrate(conn)
+    return conn
+
+
+def _migrate(conn):
+    """Adiciona colunas novas em bancos criados por versões anteriores"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(timeline)")}
+    for column in ("avg_faces", "avg_motion"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE timeline ADD COLUMN {column} REAL")
+
+
+def per_second_timeline(summary):
+    """Converte a linha do tempo por segundo do SummaryCollector em linhas do banco.
+
+    Retorna (linhas da tabela timeline, linhas da tabela timeline_emotions).
+    Em vídeos muito longos as janelas podem ter mais de 1 segundo; `second`
+    é o início da janela.
+    """
+    timeline_rows = []
+    emotion_rows = []
+    for start, frames, frames_with_faces, avg_faces, avg_motion, emotion, activity, emotion_hist \
+            in summary.timeline_seconds.rows():
+        second = int(start)
+        timeline_rows.append(
+            (second, frames, frames_with_faces, emotion, activity, avg_faces, avg_motion)
+        )
+        emotion_rows.extend(
+            (second, EMOTIONS[code], int(emotion_hist[code])) for code in np.flatnonzero(emotion_hist)
+        )
+    return timeline_rows, emotion_rows
+
+
+def index_result(result, db_path=DEFAULT_DB_PATH, analyzed_at=None):
+    """Insere o resultado de main.main no banco, substituindo análises anteriores do mesmo vídeo"""
+    summary = result["summary"]
+    fps = result["fps"]
+    metrics = summary.calculate_metrics()
+    emotion_counts = summary.emotion_counts
+    total_faces = sum(emotion_counts.values())
+    total_frames = summary.total_frames
+    timeline_rows, timeline_emotion_rows = per_second_timeline(summary)
+    video_path = os.path.abspath(result["video_path"])
+
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM videos WHERE video_path = ?", (video_path,))
+            cursor = conn.execute(
+                "INSERT INTO videos (video_path, analyzed_at, preset, fps, total_frames, duration_s, "
+                "face_detection_rate, avg_faces_per_frame, avg_detection_confidence, "
+                "emotional_stability, total_faces) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    video_path,
+                    analyzed_at or datetime.now().isoformat(timespec="seconds"),
+                    result.get("preset"),
+                    fps,
+                    total_frames,
+                    summary.frames_read / fps if fps else None,
+                    float(metrics["face_detection_rate"]),
+                    float(metrics["avg_faces_per_frame"]),
+                    float(metrics["avg_detection_confidence"]),
+                    float(metrics["emotional_stability"]),
+                    total_faces,
+                ),
+            )
+            video_id = cursor.lastrowid
+
+            conn.executemany(
+                "INSERT INTO video_emotions VALUES (?, ?, ?, ?)",
+                [(video_id, e, c, c / max(1, total_faces)) for e, c in emotion_counts.items()],
+            )
+            conn.executemany(
+                "INSERT INTO video_activities VALUES (?, ?, ?, ?)",
+                [(video_id, a, c, c / max(1, total_frames)) for a, c in summary.activity_counts.items()],
+            )
+            conn.executemany(
+                "INSERT INTO timeline VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(video_id,) + row for row in timeline_rows],
+            )
+            conn.executemany(
+                "INSERT INTO timeline_emotions VALUES (?, ?, ?, ?)",
+                [(video_id,) + row for row in timeline_emotion_rows],
+            )
+            conn.executemany(
+                "INSERT INTO emotion_spans VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (video_id, track_id, emotion, start, end, (start - 1) / fps, end / fps)
+                    for track_id, emotion, start, end in summary.all_emotion_spans()
+                ],
+            )
+    finally:
+        conn.close()
+    return video_id
+
+
+def import_json_report(json_path, db_path=DEFAULT_DB_PATH):
+    """Indexa um resumo_automatico_detalhado.json antigo (só agregados por vídeo)"""
+    with open(json_path, encoding="utf-8") as f:
+        data = json.load(f)
+    general = data.get("geral", {})
+    metrics = data.get("metricas_qualidade", {})
+    emotion_counts = data.get("emocoes", {})
+    activity_counts = data.get("atividades", {})
+    total_frames = general.get("total_frames", 0)
+    total_faces = sum(emotion_counts.values())
+
+    conn = connect(db_path)
+    try:
+        with conn:
+            json_path = os.path.abspath(json_path)
+            conn.execute("DELETE FROM videos WHERE video_path = ?", (json_path,))
+            cursor = conn.execute(
+                "INSERT INTO videos (video_path, analyzed_at, total_frames, face_detection_rate, "
+                "avg_faces_per_frame, avg_detection_confidence, emotional_stability, total_faces) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    json_path,
+                    general.get("timestamp", datetime.now().isoformat(timespec="seconds")),
+                    total_frames,
+                    metrics.get("face_detection_rate"),
+                    metrics.get("avg_faces_per_frame"),
+                    metrics.get("avg_detection_confidence"),
+                    metrics.get("emotional_stability"),
+                    total_faces,
+                ),
+            )
+            video_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO video_emotions VALUES (?, ?, ?, ?)",
+                [(video_id, e, c, c / max(1, total_faces)) for e, c in emotion_counts.items()],
+            )
+            conn.executemany(
+                "INSERT INTO video_activities VALUES (?, ?, ?, ?)",
+                [(video_id, a, c, c / max(1, total_frames)) for a, c in activity_counts.items()],
+            )
+    finally:
+        conn.close()
+    return video_id
+
+
+def _since_clause(since, days):
+    if days is not None:
+        since = (datetime.now() - timedelta(days=days)).isoformat(timespec="seconds")
+    if since:
+        return " AND v.analyzed_at >= ?", [since]
+    return "", []
+
+
+def query_videos(db_path, emotion=None, min_fraction=0.0, activity=None, min_activity_fraction=0.0,
+                 since=None, days=None):
+    """Lista vídeos filtrando por fração mínima de uma emoção/atividade e data da análise"""
+    columns = "v.video_path, v.analyzed_at, v.total_frames, v.face_detection_rate"
+    joins, where = "", " WHERE 1=1"
+    join_params, where_params = [], []
+    if emotion:
+        columns += ", ve.fraction"
+        joins += " JOIN video_emotions ve ON ve.video_id = v.id AND ve.emotion = ?"
+        join_params.append(emotion)
+        where += " AND ve.fraction >= ?"
+        where_params.append(min_fraction)
+    if activity:
+        columns += ", va.fraction"
+        joins += " JOIN video_activities va ON va.video_id = v.id AND va.activity = ?"
+        join_params.append(activity)
+        where += " AND va.fraction >= ?"
+        where_params.append(min_activity_fraction)
+    since_sql, since_params = _since_clause(since, days)
+    sql = f"SELECT {columns} FROM videos v{joins}{where}{since_sql} ORDER BY v.analyzed_at DESC"
+    params = join_params + where_params + since_params
+
+    conn = connect(db_path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def aggregate(db_path, by="emotion", since=None, days=None):
+    """Agrega contagens de emoções ou atividades em todos os vídeos"""
+    table, column = ("video_emotions", "emotion") if by == "emotion" else ("video_activities", "activity")
+    since_sql, params = _since_clause(since, days)
+    sql = (
+        f"SELECT t.{column}, COUNT(DISTINCT t.video_id), SUM(t.count), AVG(t.fraction), MAX(t.fraction) "
+        f"FROM {table} t JOIN videos v ON v.id = t.video_id WHERE 1=1{since_sql} "
+        f"GROUP BY t.{column} ORDER BY SUM(t.count) DESC"
+    )
+    conn = connect(db_path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def _write_csv(path, header, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    print(f"CSV salvo em: {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Índice SQLite dos resultados de análise.")
+    parser.add_argument("--db", type=str, default=DEFAULT_DB_PATH, help="Caminho do banco SQLite.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser(
+        "import-json", help="Indexa relatórios resumo_automatico_detalhado.json existentes."
+    )
+    import_parser.add_argument("json_paths", nargs="+")
+
+    query_parser = subparsers.add_parser("query", help="Lista vídeos que atendem aos filtros.")
+    query_parser.add_argument("--emotion", type=str, default=None)
+    query_parser.add_argument("--min_fraction", type=float, default=0.0,
+                              help="Fração mínima (0-1) da emoção entre os rostos do vídeo.")
+    query_parser.add_argument("--activity", type=str, default=None)
+    query_parser.add_argument("--min_activity_fraction", type=float, default=0.0)
+    query_parser.add_argument("--since", type=str, default=None, help="Data ISO mínima da análise.")
+    query_parser.add_argument("--days", type=float, default=None, help="Somente análises dos últimos N dias.")
+    query_parser.add_argument("--csv", type=str, default=None)
+
+    aggregate_parser = subparsers.add_parser("aggregate", help="Agrega emoções/atividades entre vídeos.")
+    aggregate_parser.add_argument("--by", choices=("emotion", "activity"), default="emotion")
+    aggregate_parser.add_argument("--since", type=str, default=None)
+    aggregate_parser.add_argument("--days", type=float, default=None)
+    aggregate_parser.add_argument("--csv", type=str, default=None)
+
+    args = parser.parse_args()
+
+    if args.command == "import-json":
+        for json_path in args.json_paths:
+            import_json_report(json_path, args.db)
+        print(f"{len(args.json_paths)} relatório(s) indexado(s) em {args.db}")
+
+    elif args.command == "query":
+        rows = query_videos(args.db, args.emotion, args.min_fraction, args.activity,
+                            args.min_activity_fraction, args.since, args.days)
+        header = ["video_path", "analyzed_at", "total_frames", "face_detection_rate"]
+        if args.emotion:
+            header.append(f"{args.emotion}_fraction")
+        if args.activity:
+            header.append(f"{args.activity}_fraction")
+        if args.csv:
+            _write_csv(args.csv, header, rows)
+        else:
+            for row in rows:
+                extras = " ".join(f"{h}={v:.1%}" for h, v in zip(header[4:], row[4:]))
+                print(f"{row[1]}  {row[0]}  frames={row[2]} detecção={row[3]:.1%} {extras}")
+            print(f"{len(rows)} vídeo(s)")
+
+    elif args.command == "aggregate":
+        rows = aggregate(args.db, args.by, args.since, args.days)
+        header = [args.by, "videos", "total", "avg_fraction", "max_fraction"]
+        if args.csv:
+            _write_csv(args.csv, header, rows)
+        else:
+            print(f"{args.by:<20} {'vídeos':>7} {'total':>9} {'média':>8} {'máximo':>8}")
+            for label, videos, total, avg_fraction, max_fraction in rows:
+                print(f"{label:<20} {videos:>7} {total:>9} {avg_fraction:>8.1%} {max_fraction:>8.1%}")
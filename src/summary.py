@@ -3,97 +3,203 @@ import numpy as np
 from collections import defaultdict
 from datetime import datetime
 import json
+from array import array
+
+from face_records import (
+    EMOTIONS, DETECTION_METHODS, NO_TRACK, as_face_records
+)
+from activity_detection import ACTIVITY_CODES
+from timeline import WindowedTimeline
+
+# Código usado em emotion_per_frame para frames sem rosto
+NO_FACE = -1
+
+# Frames sem ver uma trilha até encerrar o trecho de emoção em aberto dela
+TRACK_SPAN_GAP = 30
+
+
+def _format_media_time(seconds):
+    """Formata segundos de vídeo como MM:SS"""
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes:02d}:{seconds:02d}"
+
 
 class SummaryCollector:
-    def __init__(self):
-        self.total_frames = 0
+    def __init__(self, fps=20.0):
+        self.fps = fps  # Usado para o tempo do vídeo quando o frame não traz timestamp
+        self.total_frames = 0   # Frames analisados (update chamado)
+        self.frames_read = 0    # Maior frame_index visto; inclui frames descartados
         self.activity_counts = defaultdict(int)
-        self.emotion_counts = defaultdict(int)
-        self.emotion_per_frame = []
-        self.face_sizes = []
-        self.detection_confidences = []
-        self.detection_methods = defaultdict(int)
-        self.frame_face_counts = []  # Número de rostos por frame
+        # Emoção do rosto principal (maior área) por frame; -1 = sem rosto
+        self.emotion_per_frame = array("b")
+        self.activity_per_frame = array("b")
+        self.frame_face_counts = array("H")  # Número de rostos por frame
+        # Métricas por rosto em buffers tipados que crescem sem objetos por frame;
+        # contagens e médias são calculadas de uma vez em calculate_metrics
+        self.face_emotion_codes = array("b")
+        self.face_method_codes = array("b")
+        self.face_sizes = array("q")
+        self.detection_confidences = array("f")
         self.emotion_transitions = defaultdict(int)
         self.last_emotion_per_face = {}
         
         # Novas métricas
         self.emotion_durations = defaultdict(list)
-        self.current_emotion_start = {}
-        self.face_qualities = []
-        self.temporal_analysis = []
+        self.current_emotion_start = {}  # face_id -> (código, frame_inicio, último frame visto)
+        self.emotion_spans = []  # (face_id, emotion, frame_inicio, frame_fim) já encerrados
+        
+        # Linha do tempo por segundo e por minuto de vídeo (memória limitada)
+        self.timeline_seconds = WindowedTimeline(window_s=1.0, capacity=3600)
+        self.timeline_minutes = WindowedTimeline(window_s=60.0, capacity=1440)
+        
+        # Controle adaptativo de qualidade (preenchido por main quando ativo)
+        self.quality_adjustments = []
+        self.quality_level_frames = {}
+        
+        # Agendamento adaptativo do Face Mesh (preenchido por main / multi_stream)
+        self.mesh_stats = {}
+
+    @property
+    def emotion_code_counts(self):
+        return np.bincount(np.frombuffer(self.face_emotion_codes, dtype=np.int8),
+                           minlength=len(EMOTIONS))
+
+    @property
+    def method_code_counts(self):
+        return np.bincount(np.frombuffer(self.face_method_codes, dtype=np.int8),
+                           minlength=len(DETECTION_METHODS))
+
+    @property
+    def emotion_counts(self):
+        """Contagem de emoções por nome (visão em dict dos códigos)"""
+        return {EMOTIONS[code]: int(count)
+                for code, count in enumerate(self.emotion_code_counts) if count > 0}
+
+    @property
+    def detection_methods(self):
+        return {DETECTION_METHODS[code]: int(count)
+                for code, count in enumerate(self.method_code_counts) if count > 0}
+
+    def face_qualities(self):
+        """Qualidade de cada rosto pelo tamanho e confiança (normalizada em 0-1)"""
+        sizes = np.frombuffer(self.face_sizes, dtype=np.int64)
+        confidences = np.frombuffer(self.detection_confidences, dtype=np.float32)
+        return np.minimum(1.0, (sizes / 10000) * confidences)
+
+    def update(self, frame_index, faces_info, activity_label, motion_value=0.0, media_time_s=None):
+        """Atualiza estatísticas com informações do frame atual.
 
-    def update(self, frame_index, faces_info, activity_label):
-        """Atualiza estatísticas com informações do frame atual"""
-        self.total_frames = frame_index
+        `faces_info` pode ser um FaceRecords ou a lista de dicts antiga.
+        `media_time_s` é o tempo do frame no vídeo (ex.: CAP_PROP_POS_MSEC);
+        sem ele, o tempo é derivado de `frame_index` e do FPS. Fontes ao vivo
+        podem pular frames: as taxas usam só os frames analisados.
+        """
+        self.total_frames += 1
+        self.frames_read = max(self.frames_read, frame_index)
         self.activity_counts[activity_label] += 1
+        activity_code = ACTIVITY_CODES.get(activity_label, 0)
+        self.activity_per_frame.append(activity_code)
         
-        # Contar emoções
-        face_count = len(faces_info)
+        records = as_face_records(faces_info)
+        face_count = len(records)
         self.frame_face_counts.append(face_count)
+        if not face_count:
+            self.emotion_per_frame.append(NO_FACE)
+            codes = track_ids = ()
+        else:
+            faces = records.array
+            codes = faces["emotion"].tolist()
+            track_ids = faces["track_id"].tolist()
+            areas = records.areas
+            self.emotion_per_frame.append(codes[0] if face_count == 1 else codes[int(np.argmax(areas))])
+            # Métricas de emoção e qualidade: só anexa bytes aos buffers
+            self.face_emotion_codes.frombytes(faces["emotion"].tobytes())
+            self.face_method_codes.frombytes(faces["method"].tobytes())
+            self.face_sizes.frombytes(areas.tobytes())
+            self.detection_confidences.frombytes(faces["confidence"].tobytes())
         
-        for i, face_info in enumerate(faces_info):
-            emotion = face_info.get("emotion", "desconhecido")
-            self.emotion_counts[emotion] += 1
-            
-            # Rastrear duração das emoções por rosto
-            face_id = i  # Simplificado - em produção usar tracking ID
+        # Rastrear duração das emoções por trilha do FaceTracker; rostos sem
+        # trilha (lista de dicts antiga) usam a posição na lista do frame
+        for slot, (track_id, code) in enumerate(zip(track_ids, codes)):
+            face_id = slot if track_id == NO_TRACK else track_id
             if face_id not in self.current_emotion_start:
-                self.current_emotion_start[face_id] = (emotion, frame_index)
-            else:
-                last_emotion, start_frame = self.current_emotion_start[face_id]
-                if last_emotion != emotion:
-                    # Registra duração da emoção anterior
-                    duration = frame_index - start_frame
-                    self.emotion_durations[last_emotion].append(duration)
-                    self.emotion_transitions[f"{last_emotion}->{emotion}"] += 1
-                    self.current_emotion_start[face_id] = (emotion, frame_index)
-            
-            # Coletar métricas de qualidade
-            if "detection_confidence" in face_info:
-                self.detection_confidences.append(face_info["detection_confidence"])
-            
-            if "detection_method" in face_info:
-                self.detection_methods[face_info["detection_method"]] += 1
-            
-            if "face_area" in face_info:
-                self.face_sizes.append(face_info["face_area"])
-                
-                # Calcular qualidade baseada em tamanho e confiança
-                area = face_info["face_area"]
-                conf = face_info.get("detection_confidence", 0.5)
-                quality = min(1.0, (area / 10000) * conf)  # Normalizado
-                self.face_qualities.append(quality)
+                self.current_emotion_start[face_id] = (code, frame_index, frame_index)
+                continue
+            last_code, start_frame, _ = self.current_emotion_start[face_id]
+            if last_code != code:
+                # Registra duração da emoção anterior
+                duration = frame_index - start_frame
+                last_emotion = EMOTIONS[last_code]
+                self.emotion_durations[last_emotion].append(duration)
+                self.emotion_transitions[f"{last_emotion}->{EMOTIONS[code]}"] += 1
+                self.emotion_spans.append((face_id, last_emotion, start_frame, frame_index - 1))
+                start_frame = frame_index
+            self.current_emotion_start[face_id] = (code, start_frame, frame_index)
+        if len(self.current_emotion_start) > face_count:
+            self._close_lost_tracks(frame_index)
         
-        # Análise temporal (amostrar a cada 30 frames)
-        if frame_index % 30 == 0:
-            self.temporal_analysis.append({
-                "frame": frame_index,
-                "face_count": face_count,
-                "emotions": [f.get("emotion", "desconhecido") for f in faces_info],
-                "timestamp": datetime.now().strftime("%H:%M:%S")
-            })
+        # Linha do tempo no tempo do vídeo (todos os frames entram nas janelas)
+        if media_time_s is None:
+            media_time_s = (frame_index - 1) / self.fps
+        self.timeline_seconds.add(media_time_s, codes, activity_code, motion_value)
+        self.timeline_minutes.add(media_time_s, codes, activity_code, motion_value)
+
+    def _close_lost_tracks(self, frame_index):
+        """Encerra os trechos de trilhas não vistas há mais de TRACK_SPAN_GAP frames"""
+        for face_id, (code, start_frame, last_seen) in list(self.current_emotion_start.items()):
+            if frame_index - last_seen > TRACK_SPAN_GAP:
+                emotion = EMOTIONS[code]
+                self.emotion_durations[emotion].append(last_seen - start_frame + 1)
+                self.emotion_spans.append((face_id, emotion, start_frame, last_seen))
+                del self.current_emotion_start[face_id]
+
+    def set_mesh_stats(self, detection_stats, max_interval):
+        """Guarda as chamadas do Face Mesh feitas e evitadas (estatísticas de face_emotion)"""
+        calls = detection_stats.get('mesh_calls', 0)
+        skipped = detection_stats.get('mesh_skipped_stable', 0)
+        self.mesh_stats = {
+            "max_interval": max_interval,
+            "calls": calls,
+            "skipped_stable": skipped,
+            "skipped_profile": detection_stats.get('mesh_skipped_profile', 0),
+            "saved_fraction": skipped / max(1, calls + skipped),
+        }
+
+    def log_quality_adjustment(self, adjustment):
+        """Registra uma mudança de nível do QualityController"""
+        self.quality_adjustments.append(adjustment)
+
+    def all_emotion_spans(self):
+        """Trechos contínuos de emoção por trilha, incluindo os ainda abertos"""
+        spans = list(self.emotion_spans)
+        for face_id, (code, start_frame, last_seen) in self.current_emotion_start.items():
+            spans.append((face_id, EMOTIONS[code], start_frame, last_seen))
+        return spans
 
     def calculate_metrics(self):
         """Calcula métricas de qualidade"""
         metrics = {}
         
         # Taxa de detecção
-        frames_with_faces = sum(1 for count in self.frame_face_counts if count > 0)
+        frame_face_counts = np.frombuffer(self.frame_face_counts, dtype=np.uint16)
+        frames_with_faces = int(np.count_nonzero(frame_face_counts))
         metrics["face_detection_rate"] = frames_with_faces / max(1, self.total_frames) if self.total_frames > 0 else 0
         
         # Média de rostos por frame
-        metrics["avg_faces_per_frame"] = np.mean(self.frame_face_counts) if self.frame_face_counts else 0
+        metrics["avg_faces_per_frame"] = float(np.mean(frame_face_counts)) if frame_face_counts.size else 0
         
         # Qualidade de detecção
-        metrics["avg_detection_confidence"] = np.mean(self.detection_confidences) if self.detection_confidences else 0
-        metrics["avg_face_quality"] = np.mean(self.face_qualities) if self.face_qualities else 0
+        detection_confidences = np.frombuffer(self.detection_confidences, dtype=np.float32)
+        face_qualities = self.face_qualities()
+        face_sizes = np.frombuffer(self.face_sizes, dtype=np.int64)
+        metrics["avg_detection_confidence"] = float(np.mean(detection_confidences)) if detection_confidences.size else 0
+        metrics["avg_face_quality"] = float(np.mean(face_qualities)) if face_qualities.size else 0
         
         # Distribuição de tamanhos
-        if self.face_sizes:
-            metrics["avg_face_size"] = np.mean(self.face_sizes)
-            metrics["min_face_size"] = np.min(self.face_sizes)
-            metrics["max_face_size"] = np.max(self.face_sizes)
+        if face_sizes.size:
+            metrics["avg_face_size"] = float(np.mean(face_sizes))
+            metrics["min_face_size"] = int(np.min(face_sizes))
+            metrics["max_face_size"] = int(np.max(face_sizes))
         else:
             metrics["avg_face_size"] = 0
             metrics["min_face_size"] = 0
@@ -106,12 +212,12 @@ class SummaryCollector:
                 metrics["avg_emotion_duration"][emotion] = np.mean(durations)
         
         # Estabilidade emocional (menos transições = mais estável)
-        total_faces = sum(self.emotion_counts.values())
+        total_faces = int(self.emotion_code_counts.sum())
         total_transitions = sum(self.emotion_transitions.values())
         metrics["emotional_stability"] = 1 - (total_transitions / max(1, total_faces)) if total_faces > 0 else 0
         
         # Métodos de detecção usados
-        metrics["detection_method_distribution"] = dict(self.detection_methods)
+        metrics["detection_method_distribution"] = self.detection_methods
         
         return metrics
 
@@ -133,6 +239,9 @@ class SummaryCollector:
             f.write("📊 INFORMAÇÕES GERAIS\n")
             f.write("-" * 40 + "\n")
             f.write(f"Total de frames analisados: {self.total_frames}\n")
+            if self.frames_read > self.total_frames:
+                f.write(f"Frames lidos: {self.frames_read} "
+                        f"({self.frames_read - self.total_frames} descartados sem análise)\n")
             f.write(f"Data/hora da análise: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n\n")
             
             f.write("🎯 MÉTRICAS DE QUALIDADE DA DETECÇÃO\n")
@@ -207,17 +316,48 @@ class SummaryCollector:
                 f.write("Nenhuma transição significativa detectada.\n")
             f.write("\n")
             
-            f.write("📈 ANÁLISE TEMPORAL (amostras)\n")
+            f.write("📈 LINHA DO TEMPO (por minuto de vídeo)\n")
             f.write("-" * 40 + "\n")
-            if self.temporal_analysis:
-                for sample in self.temporal_analysis[:5]:  # Mostrar primeiras 5 amostras
-                    f.write(f"Frame {sample['frame']} ({sample['timestamp']}): ")
-                    f.write(f"{sample['face_count']} rosto(s) - ")
-                    f.write(f"Emoções: {', '.join(sample['emotions'])}\n")
+            windows = self.timeline_minutes.rows()
+            if windows:
+                window_s = self.timeline_minutes.window_s
+                for start, frames, _, avg_faces, avg_motion, emotion, activity, _ in windows[:10]:
+                    f.write(f"{_format_media_time(start)}-{_format_media_time(start + window_s)}: "
+                            f"{frames} frames, {avg_faces:.1f} rosto(s)/frame, "
+                            f"emoção dominante {emotion or '-'}, atividade {activity}, "
+                            f"movimento médio {avg_motion:.1f}\n")
+                if len(windows) > 10:
+                    f.write(f"... mais {len(windows) - 10} janela(s) no JSON detalhado\n")
             else:
-                f.write("Análise temporal não disponível\n")
+                f.write("Linha do tempo não disponível\n")
             f.write("\n")
             
+            if self.quality_adjustments or self.quality_level_frames:
+                f.write("⚙️  AJUSTES DE QUALIDADE (controle adaptativo)\n")
+                f.write("-" * 40 + "\n")
+                for level, frames in self.quality_level_frames.items():
+                    percentage = frames / self.total_frames * 100 if self.total_frames > 0 else 0
+                    f.write(f"- Nível {level}: {frames} frames ({percentage:.1f}%)\n")
+                for adj in self.quality_adjustments:
+                    settings = adj["settings"]
+                    f.write(f"Frame {adj['frame']}: nível {adj['from_level']} -> {adj['to_level']} "
+                            f"({adj['measured_fps']:.1f} frames/s, meta {adj['target_fps']:.1f}) | "
+                            f"escala {settings['detection_scale']}, "
+                            f"intervalo {settings['detection_interval']}, "
+                            f"mesh {'sim' if settings['use_mesh'] else 'não'}, "
+                            f"haar {'sim' if settings['allow_haar_fallback'] else 'não'}\n")
+                f.write("\n")
+            
+            if self.mesh_stats:
+                mesh = self.mesh_stats
+                f.write("🧩 FACE MESH ADAPTATIVO\n")
+                f.write("-" * 40 + "\n")
+                f.write(f"Intervalo máximo por rosto: {mesh['max_interval']} frame(s)\n")
+                f.write(f"Chamadas do Face Mesh: {mesh['calls']}\n")
+                f.write(f"Chamadas evitadas (expressão estável): {mesh['skipped_stable']} "
+                        f"({mesh['saved_fraction']:.1%})\n")
+                f.write(f"Chamadas evitadas (perfil): {mesh['skipped_profile']}\n\n")
+            
             f.write("💡 RECOMENDAÇÕES TÉCNICAS\n")
             f.write("-" * 40 + "\n")
             
@@ -268,14 +408,25 @@ class SummaryCollector:
         detailed_data = {
             "geral": {
                 "total_frames": self.total_frames,
+                "frames_lidos": self.frames_read,
                 "timestamp": datetime.now().isoformat()
             },
             "atividades": dict(self.activity_counts),
-            "emocoes": dict(self.emotion_counts),
+            "emocoes": self.emotion_counts,
             "metricas_qualidade": quality_metrics,
             "transicoes": dict(self.emotion_transitions),
-            "analise_temporal": self.temporal_analysis
+            "linha_do_tempo": {
+                "por_segundo": self.timeline_seconds.series(),
+                "por_minuto": self.timeline_minutes.series(),
+            }
         }
+        if self.mesh_stats:
+            detailed_data["face_mesh"] = self.mesh_stats
+        if self.quality_adjustments or self.quality_level_frames:
+            detailed_data["ajustes_qualidade"] = {
+                "frames_por_nivel": self.quality_level_frames,
+                "ajustes": self.quality_adjustments,
+            }
         
         try:
             with open(json_path, "w", encoding="utf-8") as f:
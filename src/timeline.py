@@ -0,0 +1,107 @@
+import numpy as np
+
+from face_records import EMOTIONS
+from activity_detection import ACTIVITY_LABELS
+
+
+class WindowedTimeline:
+    """
+    Agregados incrementais por janela de tempo do vídeo (não do relógio).
+
+    Cada janela de `window_s` segundos acumula frames, frames com rosto,
+    soma de rostos, soma do movimento e histogramas de emoções (todos os
+    rostos) e de atividades. Os arrays são alocados uma vez com `capacity`
+    janelas; se o vídeo passar disso, janelas vizinhas são somadas duas a
+    duas e a duração da janela dobra, então a memória nunca cresce.
+    """
+
+    def __init__(self, window_s=1.0, capacity=3600):
+        if capacity < 2 or capacity % 2:
+            raise ValueError("capacity deve ser par e maior que 1")
+        self.window_s = float(window_s)
+        self.capacity = capacity
+        self.n_windows = 0
+        self.frames = np.zeros(capacity, dtype=np.int32)
+        self.frames_with_faces = np.zeros(capacity, dtype=np.int32)
+        self.face_sum = np.zeros(capacity, dtype=np.int32)
+        self.motion_sum = np.zeros(capacity, dtype=np.float64)
+        self.emotion_hist = np.zeros((capacity, len(EMOTIONS)), dtype=np.int32)
+        self.activity_hist = np.zeros((capacity, len(ACTIVITY_LABELS)), dtype=np.int32)
+
+    def _arrays(self):
+        return (self.frames, self.frames_with_faces, self.face_sum, self.motion_sum,
+                self.emotion_hist, self.activity_hist)
+
+    def _coarsen(self):
+        """Soma pares de janelas vizinhas e dobra a duração da janela"""
+        half = self.capacity // 2
+        for values in self._arrays():
+            values[:half] = values[0::2] + values[1::2]
+            values[half:] = 0
+        self.window_s *= 2
+        self.n_windows = (self.n_windows + 1) // 2
+
+    def add(self, media_time_s, emotion_codes, activity_code, motion_value):
+        """Acumula um frame na janela que contém `media_time_s`"""
+        window = max(0, int(media_time_s // self.window_s))
+        while window >= self.capacity:
+            self._coarsen()
+            window = max(0, int(media_time_s // self.window_s))
+
+        face_count = len(emotion_codes)
+        self.frames[window] += 1
+        self.frames_with_faces[window] += face_count > 0
+        self.face_sum[window] += face_count
+        self.motion_sum[window] += motion_value
+        for code in emotion_codes:
+            self.emotion_hist[window, code] += 1
+        self.activity_hist[window, activity_code] += 1
+        self.n_windows = max(self.n_windows, window + 1)
+
+    def rows(self):
+        """Uma tupla por janela com frames:
+        (inicio_s, frames, frames_com_rosto, media_rostos, movimento_medio,
+        emocao_dominante, atividade_dominante, histograma de emoções)
+        """
+        n = self.n_windows
+        frames = self.frames[:n]
+        used = np.flatnonzero(frames)
+        divisor = np.maximum(frames, 1)
+        avg_faces = self.face_sum[:n] / divisor
+        avg_motion = self.motion_sum[:n] / divisor
+        dominant_emotion = self.emotion_hist[:n].argmax(axis=1)
+        dominant_activity = self.activity_hist[:n].argmax(axis=1)
+        return [
+            (
+                float(w * self.window_s),
+                int(frames[w]),
+                int(self.frames_with_faces[w]),
+                float(avg_faces[w]),
+                float(avg_motion[w]),
+                EMOTIONS[dominant_emotion[w]] if self.face_sum[w] else None,
+                ACTIVITY_LABELS[dominant_activity[w]],
+                self.emotion_hist[w],
+            )
+            for w in used.tolist()
+        ]
+
+    def series(self):
+        """Série temporal compacta (colunas) para o JSON; só emoções/atividades presentes"""
+        n = self.n_windows
+        frames = self.frames[:n]
+        divisor = np.maximum(frames, 1)
+        return {
+            "janela_s": self.window_s,
+            "frames": frames.tolist(),
+            "frames_com_rosto": self.frames_with_faces[:n].tolist(),
+            "media_rostos": np.round(self.face_sum[:n] / divisor, 3).tolist(),
+            "movimento_medio": np.round(self.motion_sum[:n] / divisor, 3).tolist(),
+            "emocoes": {
+                EMOTIONS[code]: self.emotion_hist[:n, code].tolist()
+                for code in np.flatnonzero(self.emotion_hist[:n].sum(axis=0))
+            },
+            "atividades": {
+                ACTIVITY_LABELS[code]: self.activity_hist[:n, code].tolist()
+                for code in np.flatnonzero(self.activity_hist[:n].sum(axis=0))
+            },
+        }
@@ -0,0 +1,127 @@
+import argparse
+import os
+import queue
+import tempfile
+import threading
+import time
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+# Codecs de saída: nome -> (fourcc, extensão do contêiner)
+OUTPUT_CODECS = {
+    "mp4v": ("mp4v", ".mp4"),
+    "avc1": ("avc1", ".mp4"),
+    "xvid": ("XVID", ".avi"),
+    "mjpg": ("MJPG", ".avi"),
+    "vp80": ("VP80", ".webm"),
+    "vp09": ("VP09", ".webm"),
+}
+DEFAULT_OUTPUT_CODEC = "mp4v"
+
+# Modos de saída de main: vídeo anotado completo, só clipes de eventos ou sem vídeo
+OUTPUT_MODES = ("full", "clips", "none")
+
+_STOP = object()
+
+
+@lru_cache(maxsize=None)
+def codec_available(name):
+    """Testa se o OpenCV local consegue gravar com o codec (grava um vídeo minúsculo)"""
+    fourcc, extension = OUTPUT_CODECS[name]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "probe" + extension)
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), 10.0, (64, 64))
+        try:
+            if not writer.isOpened():
+                return False
+            writer.write(np.zeros((64, 64, 3), dtype=np.uint8))
+        finally:
+            writer.release()
+        return os.path.exists(path) and os.path.getsize(path) > 0
+
+
+def available_codecs():
+    return [name for name in OUTPUT_CODECS if codec_available(name)]
+
+
+def resolve_codec(name):
+    """Retorna (fourcc, extensão) do codec, ou ValueError se o OpenCV local não o suporta"""
+    if name not in OUTPUT_CODECS:
+        raise ValueError(f"Codec desconhecido '{name}'. Opções: {', '.join(OUTPUT_CODECS)}")
+    if not codec_available(name):
+        raise ValueError(
+            f"Codec '{name}' não disponível neste OpenCV. Disponíveis: {', '.join(available_codecs())}"
+        )
+    return OUTPUT_CODECS[name]
+
+
+class BackgroundVideoWriter:
+    """
+    cv2.VideoWriter em uma thread separada, alimentada por uma fila limitada.
+
+    `write` só enfileira o frame; a redução para `frame_size` e a codificação
+    acontecem na thread, em paralelo com a análise do próximo frame. Com a
+    fila cheia, `write` espera (o tempo esperado fica em `blocked_s`). O
+    frame enfileirado não pode ser alterado depois.
+    """
+
+    def __init__(self, path, fourcc, fps, frame_size, max_queue=32):
+        self.path = path
+        self.frame_size = frame_size
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, frame_size)
+        if not self.writer.isOpened():
+            raise RuntimeError(f"Não foi possível criar o vídeo de saída '{path}' ({fourcc})")
+        self.frames = queue.Queue(maxsize=max_queue)
+        self.frames_written = 0
+        self.blocked_s = 0.0
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            frame = self.frames.get()
+            if frame is _STOP:
+                break
+            if self.error is not None:
+                continue
+            try:
+                if (frame.shape[1], frame.shape[0]) != self.frame_size:
+                    frame = cv2.resize(frame, self.frame_size, interpolation=cv2.INTER_AREA)
+                self.writer.write(frame)
+                self.frames_written += 1
+            except Exception as e:
+                self.error = e
+
+    def write(self, frame):
+        if self.error is not None:
+            raise RuntimeError(f"Erro ao gravar '{self.path}': {self.error}")
+        start = time.perf_counter()
+        self.frames.put(frame)
+        self.blocked_s += time.perf_counter() - start
+
+    def close(self):
+        """Espera a fila esvaziar e fecha o arquivo"""
+        self.frames.put(_STOP)
+        self.thread.join()
+        self.writer.release()
+        if self.error is not None:
+            raise RuntimeError(f"Erro ao gravar '{self.path}': {self.error}")
+
+
+def output_frame_size(frame_shape, scale):
+    """Tamanho (largura, altura) de saída; dimensões pares, exigidas por vários codecs"""
+    h, w = frame_shape[:2]
+    if scale == 1.0:
+        return w, h
+    return max(2, int(w * scale) // 2 * 2), max(2, int(h * scale) // 2 * 2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lista os codecs de saída suportados pelo OpenCV local.")
+    parser.parse_args()
+    for name, (fourcc, extension) in OUTPUT_CODECS.items():
+        status = "disponível" if codec_available(name) else "indisponível"
+        print(f"{name:<6} {fourcc:<5} {extension:<6} {status}")